@@ -7,16 +7,30 @@ licitações com keywords de alto custo.
 - Salva no Supabase (editais_pncp_altocusto / itens_pncp_altocusto)
 - Envia alerta no Telegram para cada licitação NOVA encontrada
 - Pula registros que já existem no banco (não duplica)
-- Checkpoint: salva o último dia processado para poder retomar se interromper
+- Modo "janela" (padrão): a busca de cada keyword é percorrida uma vez no
+  período inteiro, do mais novo ao mais antigo, e os editais são separados pelo
+  dia de divulgação à medida que chegam — em vez de uma busca por dia × keyword
+- O trabalho é dividido em unidades (período, keyword) num ledger SQLite
+  (radar_ledger); BACKFILL_WORKERS threads reservam e concluem unidades, e uma
+  execução interrompida retoma só as que faltaram, da página em que parou.
+  No modo "dia" (BACKFILL_MODO=dia) as unidades são (dia, keyword)
 """
 
 import os
 import sys
 import requests
 import datetime
-import time
 import logging
-import json
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import radar_busca
+import radar_cache
+import radar_http
+import radar_ledger
+import radar_match
+import radar_supabase
+import radar_telegram
 
 # ================= LOGGING =================
 logging.basicConfig(
@@ -135,7 +149,16 @@ BLOCKLIST_CONTEXTO = [
 ]
 
 DASHBOARD_URL = "https://radar-farmausa.streamlit.app/"
-CHECKPOINT_FILE = "/tmp/backfill_altocusto_checkpoint.txt"
+
+# Unidades de trabalho do ledger (radar_ledger, arquivo em BACKFILL_LEDGER):
+#   "janela": (período inteiro, keyword) — uma passada por keyword
+#   "dia":    (dia, keyword) — a unidade de um dia começa na página em que a
+#             do dia seguinte (mesma keyword) terminou
+MODO_BACKFILL = os.environ.get("BACKFILL_MODO") or "janela"
+BACKFILL_WORKERS = int(os.environ.get("BACKFILL_WORKERS", "4"))
+# Teto de páginas por unidade (páginas de radar_busca.TAM_PAGINA); a unidade que
+# bate nele sem chegar ao início do período fica com erro, não concluída
+BACKFILL_MAX_PAGINAS = int(os.environ.get("BACKFILL_MAX_PAGINAS", "100"))
 
 
 # ================= UTILITÁRIOS =================
@@ -213,14 +236,12 @@ def formatar_valor(val):
         return None
 
 
+# Autômato compilado uma vez no import: uma passada pelo texto em vez de um `in` por keyword
+MATCHER_KEYWORDS = radar_match.Matcher(KEYWORDS)
+
+
 def keyword_match(texto):
-    if not texto:
-        return False
-    texto_lower = str(texto).lower()
-    for kw in KEYWORDS:
-        if kw.lower() in texto_lower:
-            return True
-    return False
+    return MATCHER_KEYWORDS.tem(texto)
 
 
 def montar_link_pncp(cnpj, ano, seq):
@@ -244,28 +265,12 @@ def classificar_modalidade(modalidade_nome):
     return "📋 Licitação"
 
 
-def salvar_checkpoint(data_str):
-    try:
-        with open(CHECKPOINT_FILE, "w") as f:
-            f.write(data_str)
-    except Exception:
-        pass
-
-
-def carregar_checkpoint():
-    try:
-        with open(CHECKPOINT_FILE, "r") as f:
-            return f.read().strip()
-    except Exception:
-        return None
-
-
 # ================= API PNCP =================
 
 def buscar_datas_individuais(cnpj, ano, seq):
     url = f"https://pncp.gov.br/api/consulta/v1/orgaos/{cnpj}/compras/{ano}/{seq}"
     try:
-        r = requests.get(url, headers=PNCP_HEADERS, timeout=15, allow_redirects=True)
+        r = radar_cache.get(url, "compra", headers=PNCP_HEADERS, timeout=15, allow_redirects=True)
         if r.status_code == 200:
             dados = r.json()
             if isinstance(dados, dict):
@@ -285,8 +290,8 @@ def buscar_itens_relevantes(cnpj, ano, seq):
     valor_total = 0.0
 
     try:
-        r = requests.get(
-            url, headers=PNCP_HEADERS,
+        r = radar_cache.get(
+            url, "itens", headers=PNCP_HEADERS,
             params={"pagina": 1, "tamanhoPagina": 500},
             timeout=15, allow_redirects=True
         )
@@ -347,113 +352,61 @@ def buscar_itens_relevantes(cnpj, ano, seq):
     return itens_texto, itens_banco, valor_total
 
 
-# ─── API SEARCH ─────────
-
-def buscar_search_api(keyword, data_fmt, pagina=1, tam_pagina=20):
-    url = "https://pncp.gov.br/api/search/"
-    params = {
-        "q": keyword,
-        "tipos_documento": "edital",
-        "ordenacao": "-data",
-        "pagina": pagina,
-        "tam_pagina": tam_pagina,
-    }
-    try:
-        r = requests.get(url, params=params, headers=PNCP_HEADERS, timeout=30)
-        if r.status_code == 200:
-            dados = r.json()
-            items = dados.get("items", [])
-            filtrados = [
-                i for i in items
-                if (i.get("data_publicacao_pncp") or "").startswith(data_fmt)
-            ]
-            return filtrados
-        return []
-    except requests.exceptions.Timeout:
-        log.warning(f"Timeout search '{keyword}' pag={pagina}")
-        return []
-    except Exception as e:
-        log.error(f"Erro search: {e}")
-        return []
-
-
-def normalizar_item_search(item):
-    cnpj = item.get("orgao_cnpj", "")
-    ano = item.get("ano", "")
-    seq = item.get("numero_sequencial", "")
-    return {
-        "objetoCompra": item.get("description", item.get("title", "")),
-        "orgaoEntidade": {
-            "cnpj": cnpj,
-            "razaoSocial": item.get("orgao_nome", ""),
-        },
-        "unidadeOrgao": {
-            "ufSigla": item.get("uf", ""),
-        },
-        "anoCompra": ano,
-        "sequencialCompra": seq,
-        "modalidadeNome": item.get("modalidade_licitacao_nome", ""),
-        "dataPublicacaoPncp": item.get("data_publicacao_pncp"),
-        "dataAberturaProposta": item.get("data_inicio_vigencia"),
-        "dataEncerramentoProposta": item.get("data_fim_vigencia"),
-        "valorTotalEstimado": item.get("valor_total_estimado"),
-        "numeroCompra": item.get("numero_sequencial", ""),
-        "numeroControlePNCP": item.get("item_url", ""),
-        "linkSistemaOrigem": "",
-        "_source": "search",
-    }
-
+# ================= SUPABASE =================
 
-def buscar_por_search(data_str):
-    data_fmt = datetime.datetime.strptime(data_str, "%Y%m%d").strftime("%Y-%m-%d")
-    todos = {}
+def buscar_existentes_supabase(contratacoes):
+    """Pré-verificação do dia: {url_id: registro} de todas as contratações em poucas consultas."""
+    return radar_supabase.buscar_existentes_contratacoes(
+        f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}", SUPABASE_HEADERS, contratacoes, colunas=["url_id"])
 
-    for kw in KEYWORDS_BUSCA:
-        pagina = 1
-        while True:
-            items = buscar_search_api(kw, data_fmt, pagina=pagina)
-            for item in items:
-                cnpj = item.get("orgao_cnpj", "")
-                ano = item.get("ano", "")
-                seq = item.get("numero_sequencial", "")
-                if cnpj and ano and seq:
-                    url_id = f"/compras/{cnpj}/{ano}/{seq}"
-                    if url_id not in todos:
-                        todos[url_id] = normalizar_item_search(item)
-            if len(items) < 20:
-                break
-            pagina += 1
-            time.sleep(0.2)
-            if pagina > 10:
-                break
-
-    return list(todos.values())
 
+def criar_buffer_gravacao():
+    """Buffer de upserts em lote para editais/itens novos (descarregado por tamanho e ao fim do dia)."""
+    return radar_supabase.BufferGravacao(
+        f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}",
+        f"{SUPABASE_URL}/rest/v1/{TABELA_ITENS}",
+        SUPABASE_HEADERS,
+    )
 
-# ================= SUPABASE =================
 
-def check_and_save_supabase(dados_edital, dados_itens):
+def check_and_save_supabase(dados_edital, dados_itens, existentes=None, gravacao=None, ao_salvar=None):
     url_id = dados_edital["url_id"]
     endpoint_editais = f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}"
     endpoint_itens = f"{SUPABASE_URL}/rest/v1/{TABELA_ITENS}"
 
     dados_para_salvar = {k: v for k, v in dados_edital.items() if not k.startswith("_")}
 
-    try:
-        check = requests.get(
-            f"{endpoint_editais}?url_id=eq.{requests.utils.quote(url_id)}&select=url_id",
-            headers=SUPABASE_HEADERS,
-            timeout=10
-        )
-        if check.status_code == 200 and len(check.json()) > 0:
+    if existentes is not None:
+        if url_id in existentes:
             log.info(f"⏭️  Já existe: {url_id}")
             return False
-    except Exception as e:
-        log.warning(f"Aviso verificação Supabase: {e}")
+    else:
+        try:
+            check = radar_http.get(
+                f"{endpoint_editais}?url_id=eq.{requests.utils.quote(url_id)}&select=url_id",
+                headers=SUPABASE_HEADERS,
+                timeout=10
+            )
+            if check.status_code == 200 and len(check.json()) > 0:
+                log.info(f"⏭️  Já existe: {url_id}")
+                return False
+        except Exception as e:
+            log.warning(f"Aviso verificação Supabase: {e}")
+
+    if gravacao is not None:
+        # Gravação em lote: só depois do edital e dos itens confirmados ele entra
+        # em `existentes` e o alerta (ao_salvar) sai
+        def confirmado():
+            if existentes is not None:
+                existentes[url_id] = {"url_id": url_id}
+            if ao_salvar:
+                ao_salvar()
+
+        return gravacao.adicionar(dados_para_salvar, dados_itens, ao_salvar=confirmado)
 
     headers_upsert = {**SUPABASE_HEADERS, "Prefer": "resolution=merge-duplicates,return=minimal"}
     try:
-        res = requests.post(
+        res = radar_http.post(
             f"{endpoint_editais}?on_conflict=url_id",
             headers=headers_upsert,
             json=dados_para_salvar,
@@ -463,6 +416,8 @@ def check_and_save_supabase(dados_edital, dados_itens):
             log.error(f"ERRO upsert ({url_id}): {res.status_code} - {res.text[:300]}")
             return False
         log.info(f"✅ NOVO salvo: {url_id}")
+        if existentes is not None:
+            existentes[url_id] = {"url_id": url_id}
     except Exception as e:
         log.error(f"ERRO Supabase ({url_id}): {e}")
         return False
@@ -471,7 +426,7 @@ def check_and_save_supabase(dados_edital, dados_itens):
         try:
             for item in dados_itens:
                 item["edital_url_id"] = url_id
-            requests.post(
+            radar_http.post(
                 endpoint_itens,
                 headers={**SUPABASE_HEADERS, "Prefer": "return=minimal"},
                 json=dados_itens,
@@ -480,11 +435,22 @@ def check_and_save_supabase(dados_edital, dados_itens):
         except Exception as e:
             log.warning(f"Erro itens: {e}")
 
+    if ao_salvar:
+        ao_salvar()
     return True
 
 
 # ================= TELEGRAM =================
 
+# Alertas da execução: os TELEGRAM_DIGEST_MINIMO primeiros editais novos saem na
+# hora, um a um; depois, em digest agrupado por UF
+ALERTAS = radar_telegram.Alertas(
+    TELEGRAM_BOT_TOKEN, CHAT_ID,
+    "💊 <b>LICITAÇÕES ALTO CUSTO (retroativas)</b>",
+    rodape=f'📊 <a href="{DASHBOARD_URL}">Ver no Radar FarmaUSA</a>',
+)
+
+
 def enviar_telegram(edital, itens_texto, modalidade_label):
     if not ENVIAR_TELEGRAM:
         return
@@ -535,45 +501,13 @@ def enviar_telegram(edital, itens_texto, modalidade_label):
         f"📊 <a href=\"{DASHBOARD_URL}\">Ver no Radar FarmaUSA</a>"
     )
 
-    try:
-        resp = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-            json={
-                "chat_id": CHAT_ID,
-                "text": msg,
-                "parse_mode": "HTML",
-                "disable_web_page_preview": True,
-            },
-            timeout=10,
-        )
-        if resp.status_code == 200:
-            log.info(f"🚀 Telegram: {titulo[:60]}")
-        elif resp.status_code == 429:
-            # Rate limit do Telegram — esperar e tentar de novo
-            retry_after = 5
-            try:
-                retry_after = resp.json().get("parameters", {}).get("retry_after", 5)
-            except Exception:
-                pass
-            log.warning(f"⏳ Telegram rate limit — aguardando {retry_after}s")
-            time.sleep(retry_after + 1)
-            requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                json={"chat_id": CHAT_ID, "text": msg, "parse_mode": "HTML", "disable_web_page_preview": True},
-                timeout=10,
-            )
-        else:
-            log.error(f"Telegram erro {resp.status_code}: {resp.text[:200]}")
-    except Exception as e:
-        log.error(f"Telegram falhou: {e}")
-
-    # Pausa entre mensagens para não tomar rate limit
-    time.sleep(1.5)
+    linha = radar_telegram.linha_digest(link_pncp, orgao, titulo, modalidade_label, prazo_txt)
+    ALERTAS.adicionar(uf, linha, msg, descricao=titulo, disable_web_page_preview=True)
 
 
 # ================= PROCESSAMENTO =================
 
-def processar_contratacao(item):
+def processar_contratacao(item, existentes=None, gravacao=None, enriquecido=None):
     objeto = item.get("objetoCompra", "")
     from_search = item.get("_source") == "search"
 
@@ -593,19 +527,19 @@ def processar_contratacao(item):
 
     url_id = f"/compras/{cnpj}/{ano}/{seq}"
 
+    # Datas e itens vêm do enriquecimento em lote do dia; sem ele, busca aqui mesmo
+    if enriquecido is None:
+        enriquecido = radar_busca.enriquecer_contratacao(item, buscar_datas_individuais, buscar_itens_relevantes)
+
     data_inicio = item.get("dataAberturaProposta")
     data_fim = item.get("dataEncerramentoProposta")
+    di, df = enriquecido["datas"]
+    if di:
+        data_inicio = di
+    if df:
+        data_fim = df
 
-    if not data_inicio or not data_fim:
-        di, df = buscar_datas_individuais(cnpj, ano, seq)
-        if di:
-            data_inicio = di
-        if df:
-            data_fim = df
-        time.sleep(0.3)
-
-    itens_texto, itens_banco, valor_itens = buscar_itens_relevantes(cnpj, ano, seq)
-    time.sleep(0.3)
+    itens_texto, itens_banco, valor_itens = enriquecido["itens"]
 
     if not itens_banco and from_search:
         log.info(f"   ⚠️  Itens vazio mas origem search — salvando")
@@ -641,12 +575,154 @@ def processar_contratacao(item):
         "_seq": str(seq),
     }
 
-    if check_and_save_supabase(dados_edital, itens_banco):
+    def ao_salvar():
         modalidade_label = classificar_modalidade(modalidade_nome)
         enviar_telegram(dados_edital, itens_texto, modalidade_label)
-        return True
 
-    return False
+    return check_and_save_supabase(dados_edital, itens_banco, existentes, gravacao, ao_salvar)
+
+
+def processar_lote(contratacoes, gravacao):
+    """
+    Pré-verificação, enriquecimento e gravação de um lote. Retorna os url_ids do
+    lote que não foram gravados (edital ou itens).
+    """
+    existentes = buscar_existentes_supabase(contratacoes)
+    enriquecidos = radar_busca.enriquecer_contratacoes(
+        contratacoes, keyword_match, objeto_bloqueado, buscar_datas_individuais, buscar_itens_relevantes)
+    for item, enriquecido in zip(contratacoes, enriquecidos):
+        processar_contratacao(item, existentes, gravacao, enriquecido)
+    gravacao.flush()
+    return gravacao.nao_gravados_entre(radar_supabase.url_id_da_contratacao(i) for i in contratacoes)
+
+
+# ================= UNIDADES DE TRABALHO =================
+
+def periodo_janela(ledger, hoje):
+    """
+    Período do modo janela ("AAAA-MM-DD..AAAA-MM-DD"): o que ficou inacabado no
+    ledger; senão, do fim da última janela (ou DATA_INICIO) até hoje.
+    """
+    janelas = {p: n for p, n in ledger.periodos().items() if ".." in p}
+    for periodo, (total, concluidas) in sorted(janelas.items()):
+        if concluidas < total:
+            return periodo
+    inicio = max((p.split("..")[1] for p in janelas), default=DATA_INICIO)
+    return f"{inicio}..{hoje}"
+
+
+def periodos_dia(hoje):
+    """Dias de DATA_INICIO até hoje, do mais recente ao mais antigo."""
+    data_ini = datetime.datetime.strptime(DATA_INICIO, "%Y-%m-%d").date()
+    data_fim = datetime.datetime.strptime(hoje, "%Y-%m-%d").date()
+    return [(data_fim - datetime.timedelta(days=n)).strftime("%Y-%m-%d")
+            for n in range((data_fim - data_ini).days + 1)]
+
+
+def limites_periodo(periodo):
+    if ".." in periodo:
+        data_ini, data_fim = periodo.split("..")
+        return data_ini, data_fim
+    return periodo, periodo
+
+
+def processar_unidade(ledger, periodo, kw, pagina, gravacao, vistos, por_dia, lock):
+    """
+    Percorre a busca de `kw` no período a partir de `pagina`, gravando página a
+    página; o ledger avança a cada página gravada por completo — uma página com
+    edital não gravado devolve a unidade à fila nela. Só conclui a unidade quando a
+    busca chega ao início do período: parar em BACKFILL_MAX_PAGINAS deixa a
+    unidade com erro, retomável numa execução com teto maior. Retorna os editais
+    novos nesta execução.
+    """
+    data_ini, data_fim = limites_periodo(periodo)
+
+    def parar_no_teto():
+        motivo = f"teto de {BACKFILL_MAX_PAGINAS} páginas antes de {data_ini}"
+        ledger.falhar(periodo, kw, motivo, definitivo=True)
+        log.warning(f"   ⚠️  '{kw}' [{periodo}]: {motivo} — unidade incompleta "
+                    f"(aumente BACKFILL_MAX_PAGINAS para retomar)")
+
+    if pagina > BACKFILL_MAX_PAGINAS:
+        parar_no_teto()
+        return 0
+
+    encontrados = 0
+    for pag, hits, fim in radar_busca.percorrer_termo(
+            kw, data_ini, data_fim, pagina=pagina, max_paginas=BACKFILL_MAX_PAGINAS):
+        contratacoes, datas = [], {}
+        with lock:
+            for data, url_id, item in sorted(hits, key=lambda h: h[0]):
+                if url_id in vistos:
+                    continue
+                vistos.add(url_id)
+                por_dia[data] = por_dia.get(data, 0) + 1
+                datas[url_id] = data
+                contratacoes.append(item)
+
+        nao_gravados = set()
+        if contratacoes:
+            log.info(f"   📋 '{kw}' [{periodo}] pág. {pag}: {len(contratacoes)} edital(is) novo(s)")
+            nao_gravados = processar_lote(contratacoes, gravacao)
+        encontrados += len(contratacoes) - len(nao_gravados)
+
+        if nao_gravados:
+            # A página fica para a próxima tentativa, que só deve pular o que foi gravado
+            with lock:
+                for url_id in nao_gravados:
+                    vistos.discard(url_id)
+                    por_dia[datas[url_id]] -= 1
+            ledger.falhar(periodo, kw, f"{len(nao_gravados)} edital(is) não gravado(s) na pág. {pag}")
+            log.warning(f"   ⚠️  '{kw}' [{periodo}] pág. {pag}: {len(nao_gravados)} edital(is) "
+                        f"não gravado(s) — unidade volta para a fila nesta página")
+            return encontrados
+
+        if fim == radar_busca.FIM_DATA:
+            ledger.concluir(periodo, kw, len(contratacoes))
+            if ".." not in periodo:
+                # O dia anterior começa, no máximo, na última página deste dia
+                anterior = (datetime.datetime.strptime(periodo, "%Y-%m-%d") -
+                            datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+                ledger.sugerir_pagina(anterior, kw, pag)
+            return encontrados
+        ledger.avancar(periodo, kw, pag + 1, len(contratacoes))
+        if fim == radar_busca.FIM_TETO:
+            # Não se sabe onde o dia termina: nada de sugerir_pagina ao dia anterior
+            parar_no_teto()
+            return encontrados
+
+    ledger.falhar(periodo, kw, "falha na API search")
+    log.warning(f"   ⚠️  '{kw}' [{periodo}]: falha na API search — unidade volta para a fila")
+    return encontrados
+
+
+def executar_unidades(ledger, gravacao):
+    """BACKFILL_WORKERS threads reservando unidades até o ledger esvaziar."""
+    vistos, por_dia, lock = set(), {}, threading.Lock()
+
+    def worker():
+        total = 0
+        while True:
+            unidade = ledger.reservar()
+            if unidade is None:
+                return total
+            periodo, kw, pagina = unidade
+            try:
+                total += processar_unidade(ledger, periodo, kw, pagina, gravacao, vistos, por_dia, lock)
+            except Exception as e:
+                log.error(f"Erro na unidade '{kw}' [{periodo}]: {e}")
+                ledger.falhar(periodo, kw, e)
+            # Digest dos alertas da unidade (as maiores já saíram por mensagem cheia)
+            ALERTAS.descarregar()
+
+    with ThreadPoolExecutor(max_workers=BACKFILL_WORKERS) as pool:
+        futuros = [pool.submit(worker) for _ in range(BACKFILL_WORKERS)]
+    total = sum(f.result() for f in futuros)
+
+    log.info(f"\n📅 Editais por dia de divulgação: {len(por_dia)} dia(s) com resultado")
+    for data in sorted(por_dia):
+        log.info(f"   {data}: {por_dia[data]}")
+    return total
 
 
 # ================= MAIN =================
@@ -662,82 +738,68 @@ def main():
         log.error("❌ SUPABASE_URL ou SUPABASE_KEY não configurados!")
         sys.exit(1)
 
-    hoje = datetime.date.today()
-    data_ini = datetime.datetime.strptime(DATA_INICIO, "%Y-%m-%d").date()
+    hoje = datetime.date.today().strftime("%Y-%m-%d")
 
-    # Verificar checkpoint para retomar de onde parou
-    checkpoint = carregar_checkpoint()
-    if checkpoint:
-        try:
-            data_retomada = datetime.datetime.strptime(checkpoint, "%Y-%m-%d").date()
-            data_retomada += datetime.timedelta(days=1)  # começa do dia seguinte
-            if data_retomada > data_ini:
-                log.info(f"📌 Retomando do checkpoint: {data_retomada.strftime('%d/%m/%Y')}")
-                data_ini = data_retomada
-        except Exception:
-            pass
-
-    # Gerar lista de dias
-    dias = []
-    d = data_ini
-    while d <= hoje:
-        dias.append(d)
-        d += datetime.timedelta(days=1)
-
-    log.info(f"📅 Período: {data_ini.strftime('%d/%m/%Y')} a {hoje.strftime('%d/%m/%Y')}")
-    log.info(f"📆 Total de dias: {len(dias)}")
     log.info(f"🔑 Keywords busca: {len(KEYWORDS_BUSCA)} termos")
     log.info(f"📱 Telegram: {'ATIVADO' if ENVIAR_TELEGRAM else 'DESATIVADO'}")
-    log.info("-" * 60)
-
-    total_geral = 0
-    total_novas = 0
-
-    for i, dia in enumerate(dias, 1):
-        dia_str = dia.strftime("%Y%m%d")
-        dia_fmt = dia.strftime("%d/%m/%Y")
-        log.info(f"\n📆 [{i}/{len(dias)}] {dia_fmt}")
+    log.info(f"🧭 Modo: {MODO_BACKFILL} — {BACKFILL_WORKERS} worker(s)")
 
-        contratacoes = buscar_por_search(dia_str)
-        log.info(f"   📋 {len(contratacoes)} editais encontrados")
-        total_geral += len(contratacoes)
+    ledger = radar_ledger.Ledger()
+    abandonadas = ledger.resetar_abandonadas()
+    if abandonadas:
+        log.info(f"📌 {abandonadas} unidade(s) de uma execução interrompida voltaram para a fila")
 
-        novas_dia = 0
-        for item in contratacoes:
-            if processar_contratacao(item):
-                novas_dia += 1
-                total_novas += 1
-
-        if novas_dia > 0:
-            log.info(f"   ✅ {novas_dia} novas salvas neste dia")
-
-        salvar_checkpoint(dia.strftime("%Y-%m-%d"))
-        time.sleep(0.5)
-
-    log.info("\n" + "=" * 60)
-    log.info("📊 RESUMO FINAL BACKFILL:")
-    log.info(f"   Dias processados:    {len(dias)}")
-    log.info(f"   Editais encontrados: {total_geral}")
-    log.info(f"   Novos salvos:        {total_novas}")
-    log.info("=" * 60)
+    if MODO_BACKFILL == "janela":
+        periodos = [periodo_janela(ledger, hoje)]
+    else:
+        periodos = periodos_dia(hoje)
+    criadas = ledger.registrar((p, kw) for p in periodos for kw in KEYWORDS_BUSCA)
+
+    data_ini = min(limites_periodo(p)[0] for p in periodos)
+    data_fim = max(limites_periodo(p)[1] for p in periodos)
+    n_dias = (datetime.datetime.strptime(data_fim, "%Y-%m-%d") -
+              datetime.datetime.strptime(data_ini, "%Y-%m-%d")).days + 1
+    periodo_br = " a ".join(datetime.datetime.strptime(d, "%Y-%m-%d").strftime("%d/%m/%Y")
+                            for d in (data_ini, data_fim))
+    log.info(f"📅 Período: {periodo_br} ({n_dias} dias)")
+    log.info(f"📒 Ledger: {criadas} unidade(s) nova(s) — {ledger.resumo(periodos)}")
+    log.info("-" * 60)
 
-    # Mensagem final no Telegram
-    if ENVIAR_TELEGRAM and TELEGRAM_BOT_TOKEN and CHAT_ID:
-        msg = (
-            f"📊 <b>Backfill Alto Custo — Concluído</b>\n\n"
-            f"📅 Período: {datetime.datetime.strptime(DATA_INICIO, '%Y-%m-%d').strftime('%d/%m/%Y')} a {hoje.strftime('%d/%m/%Y')}\n"
-            f"📆 Dias processados: {len(dias)}\n"
-            f"📋 Editais encontrados: {total_geral}\n"
-            f"🆕 Novos salvos: <b>{total_novas}</b>"
-        )
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                json={"chat_id": CHAT_ID, "text": msg, "parse_mode": "HTML"},
-                timeout=10,
+    try:
+        gravacao = criar_buffer_gravacao()
+        total_geral = executar_unidades(ledger, gravacao)
+
+        total_novas = gravacao.inseridos
+
+        log.info("\n" + "=" * 60)
+        log.info(f"💾 Gravação: {gravacao.resumo()}")
+        for linha in radar_http.resumo():
+            log.info(f"🌐 {linha}")
+        log.info(f"🗄️  Cache HTTP: {radar_cache.resumo()}")
+        log.info(f"🔎 Busca: {radar_busca.resumo()}")
+        log.info(f"📒 Ledger: {ledger.resumo(periodos)}")
+        ledger.fechar()
+        log.info("📊 RESUMO FINAL BACKFILL:")
+        log.info(f"   Dias processados:    {n_dias}")
+        log.info(f"   Editais encontrados: {total_geral}")
+        log.info(f"   Novos salvos:        {total_novas}")
+        log.info("=" * 60)
+
+        # Mensagem final no Telegram
+        if ENVIAR_TELEGRAM and TELEGRAM_BOT_TOKEN and CHAT_ID:
+            msg = (
+                f"📊 <b>Backfill Alto Custo — Concluído</b>\n\n"
+                f"📅 Período: {periodo_br}\n"
+                f"📆 Dias processados: {n_dias}\n"
+                f"📋 Editais encontrados: {total_geral}\n"
+                f"🆕 Novos salvos: <b>{total_novas}</b>"
             )
-        except Exception:
-            pass
+            ALERTAS.enviar(anexo=msg)
+    finally:
+        # Se a execução cair no meio, o digest pendente ainda sai (no fim
+        # normal ele já foi enviado e isto não manda nada)
+        ALERTAS.enviar()
+        radar_telegram.flush()
 
 
 if __name__ == "__main__":
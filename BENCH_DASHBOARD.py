@@ -0,0 +1,271 @@
+"""
+BENCH DASHBOARD - Tempo do processar_dados (dashboard_dados.py)
+===============================================================
+Gera editais/itens sintéticos no formato do Supabase (datas ISO com e sem
+fuso, nulos, valores só com unitário × quantidade) e mede:
+
+- processar_dados atual (vetorizado, dashboard_dados.py)
+- a versão anterior, linha a linha (pd.to_datetime por valor, apply(axis=1)),
+  mantida aqui só como referência
+
+Também confere que as colunas exibidas saem iguais nas duas versões.
+
+Uso:
+    python BENCH_DASHBOARD.py              # 10k e 100k editais
+    python BENCH_DASHBOARD.py 5000 50000   # tamanhos escolhidos
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dashboard_dados import processar_dados
+
+TAMANHOS = [int(n) for n in sys.argv[1:]] or [10_000, 100_000]
+ITENS_POR_EDITAL = 3
+COLUNAS_COMPARADAS = ["status", "prazo", "link_pncp", "Abertura", "Encerramento", "Publicação",
+                      "produto", "preco_unit_fmt", "qtd_fmt", "valor_total_fmt", "n_itens"]
+
+
+# ================= DADOS SINTÉTICOS =================
+
+def gerar_dados(n, semente=42):
+    rng = np.random.default_rng(semente)
+    agora = datetime.now()
+    ufs = np.array(["SP", "RJ", "MG", "BA", "PR", "RS", "PE", "CE", "GO", "DF"])
+
+    def datas(desvio_dias, nulos):
+        base = [agora + timedelta(hours=float(h)) for h in rng.normal(0, desvio_dias * 24, n)]
+        fuso = rng.random(n)
+        saida = []
+        for dt, f, nulo in zip(base, fuso, rng.random(n) < nulos):
+            if nulo:
+                saida.append(None)
+            elif f < 0.6:
+                saida.append(dt.strftime("%Y-%m-%dT%H:%M:%S") + "+00:00")  # timestamptz
+            elif f < 0.8:
+                saida.append(dt.strftime("%Y-%m-%dT%H:%M:%S") + "-03:00")
+            else:
+                saida.append(dt.strftime("%Y-%m-%dT%H:%M:%S"))              # sem fuso
+        return saida
+
+    url_ids = [f"/compras/{10**13 + i}/2026/{i % 997 + 1}" for i in range(n)]
+    df_editais = pd.DataFrame({
+        "url_id": url_ids,
+        "titulo": [f"Edital nº {i}" for i in range(n)],
+        "objeto": [f"Aquisição de canabidiol 200mg/ml lote {i}" for i in range(n)],
+        "orgao": [f"Secretaria Municipal de Saúde {i % 500}" for i in range(n)],
+        "uf": rng.choice(ufs, n),
+        "modalidade": rng.choice(["Pregão - Eletrônico", "Dispensa", "Concorrência"], n),
+        "valor_total_estimado": np.where(rng.random(n) < 0.3, np.nan, rng.uniform(1e3, 1e6, n).round(2)),
+        "data_publicacao": datas(30, 0.0),
+        "data_inicio": datas(10, 0.1),
+        "data_fim": datas(10, 0.2),
+    })
+
+    m = n * ITENS_POR_EDITAL
+    quantidade = rng.integers(1, 5000, m).astype(float)
+    unitario = rng.uniform(10, 3000, m).round(2)
+    total = np.where(rng.random(m) < 0.4, np.nan, (quantidade * unitario).round(2))
+    df_itens = pd.DataFrame({
+        "edital_url_id": rng.choice(url_ids, m),
+        "descricao": [f"Canabidiol 200mg/ml frasco {i}" for i in range(m)],
+        "quantidade": quantidade,
+        "valor_unitario": np.where(rng.random(m) < 0.1, np.nan, unitario),
+        "valor_total": total,
+    })
+    return df_editais, df_itens
+
+
+# ================= VERSÃO ANTERIOR (REFERÊNCIA) =================
+
+def processar_dados_anterior(df_editais, df_itens, hoje=None):
+    """processar_dados como estava no DASHBOARD.py antes da vetorização (+ `hoje` fixável)."""
+    if df_editais.empty:
+        return pd.DataFrame()
+
+    hoje = hoje or datetime.now()
+
+    def parse_dt(col):
+        from zoneinfo import ZoneInfo
+        tz_br = ZoneInfo("America/Sao_Paulo")
+
+        def _parse_single(val):
+            if not val or pd.isna(val):
+                return pd.NaT
+            try:
+                dt = pd.to_datetime(val)
+                if dt.tzinfo is not None:
+                    dt = dt.tz_convert(tz_br).replace(tzinfo=None)
+                return dt
+            except Exception:
+                return pd.NaT
+        return pd.Series([_parse_single(v) for v in col], index=col.index)
+
+    df_editais["dt_fim"] = parse_dt(df_editais["data_fim"])
+    df_editais["dt_inicio"] = parse_dt(df_editais["data_inicio"])
+    df_editais["dt_pub"] = parse_dt(df_editais["data_publicacao"])
+
+    def calcular_status(row):
+        if pd.isna(row["dt_fim"]):
+            return "⚪ Sem data"
+        diff_h = (row["dt_fim"] - hoje).total_seconds() / 3600
+        if diff_h < 0:
+            return "🔴 Encerrado"
+        elif diff_h <= 72:
+            return "⚠️ Urgente"
+        else:
+            return "✅ Aberto"
+
+    def calcular_prazo_texto(row):
+        if pd.isna(row["dt_fim"]):
+            return "—"
+        diff_h = (row["dt_fim"] - hoje).total_seconds() / 3600
+        if diff_h < 0:
+            dias = int(abs(diff_h) // 24)
+            return f"Encerrou há {dias}d"
+        elif diff_h < 24:
+            return f"⚠️ {int(diff_h)}h restantes"
+        else:
+            dias = int(diff_h // 24)
+            return f"{dias} dias"
+
+    df_editais["status"] = df_editais.apply(calcular_status, axis=1)
+    df_editais["prazo"] = df_editais.apply(calcular_prazo_texto, axis=1)
+
+    def montar_link(url_id):
+        if not url_id:
+            return ""
+        partes = str(url_id).strip("/").split("/")
+        if len(partes) >= 4 and partes[0] == "compras":
+            return f"https://pncp.gov.br/app/editais/{partes[1]}/{partes[2]}/{partes[3]}"
+        return f"https://pncp.gov.br/app/editais{url_id}"
+
+    df_editais["link_pncp"] = df_editais["url_id"].apply(montar_link)
+
+    df_editais["Abertura"] = df_editais["dt_inicio"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
+    df_editais["Encerramento"] = df_editais["dt_fim"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
+    df_editais["Publicação"] = df_editais["dt_pub"].dt.strftime("%d/%m/%Y").fillna("—")
+
+    df_itens_v = df_itens.copy()
+
+    def _valor_item(row):
+        try:
+            vt = float(row.get("valor_total") or 0)
+            if vt > 0:
+                return vt
+        except Exception:
+            pass
+        try:
+            return float(row.get("valor_unitario") or 0) * float(row.get("quantidade") or 0)
+        except Exception:
+            return 0.0
+
+    df_itens_v["_valor_item"] = df_itens_v.apply(_valor_item, axis=1)
+    df_principal = (
+        df_itens_v
+        .sort_values("_valor_item", ascending=False)
+        .drop_duplicates(subset="edital_url_id", keep="first")
+        .copy()
+    )
+    df_principal = df_principal.rename(columns={
+        "edital_url_id": "url_id",
+        "descricao": "_descricao_principal",
+        "quantidade": "_qtd_principal",
+        "valor_unitario": "_preco_unit_principal",
+        "valor_total": "_valor_total_principal",
+    })
+    n_itens_agg = df_itens.groupby("edital_url_id").size().reset_index(name="n_itens")
+    n_itens_agg.rename(columns={"edital_url_id": "url_id"}, inplace=True)
+    df = df_editais.merge(
+        df_principal[["url_id", "_descricao_principal", "_qtd_principal",
+                      "_preco_unit_principal", "_valor_total_principal", "_valor_item"]],
+        on="url_id", how="left"
+    ).merge(n_itens_agg, on="url_id", how="left")
+    df["qtd_total"] = df["_qtd_principal"]
+    df["preco_unit_max"] = df["_preco_unit_principal"]
+
+    def resumir_produto(row):
+        desc = str(row.get("_descricao_principal", "") or "")
+        if desc and len(desc) > 5:
+            return desc[:120]
+        return str(row.get("objeto", row.get("titulo", "—")) or "—")[:120]
+
+    df["produto"] = df.apply(resumir_produto, axis=1)
+
+    def formatar_preco(val):
+        if pd.isna(val) or val is None:
+            return "—"
+        return f"R$ {float(val):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+    df["preco_unit_fmt"] = df["preco_unit_max"].apply(formatar_preco)
+    df["qtd_fmt"] = df["qtd_total"].apply(
+        lambda x: f"{int(x):,}".replace(",", ".") if pd.notna(x) and x > 0 else "—"
+    )
+
+    def formatar_valor_total(val):
+        try:
+            f = float(val)
+            if f <= 0:
+                return "—"
+            return f"R$ {f:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+        except Exception:
+            return "—"
+
+    df["_valor_exib"] = df["_valor_total_principal"].fillna(df["_valor_item"])
+    df["_valor_exib"] = df["_valor_exib"].where(
+        df["_valor_exib"].fillna(0) > 0, df["valor_total_estimado"]
+    )
+    df["valor_total_fmt"] = df["_valor_exib"].apply(formatar_valor_total)
+    return df
+
+
+# ================= MEDIÇÃO =================
+
+def medir(funcao, df_editais, df_itens, repeticoes, hoje):
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        editais, itens = df_editais.copy(), df_itens.copy()
+        inicio = time.perf_counter()
+        resultado = funcao(editais, itens, hoje=hoje)
+        duracao = time.perf_counter() - inicio
+        melhor = duracao if melhor is None else min(melhor, duracao)
+    return melhor, resultado
+
+
+def comparar(novo, anterior):
+    """
+    Colunas de COLUNAS_COMPARADAS que diferem (por url_id). A versão anterior
+    exibia "R$ nan" para edital sem itens nem valor estimado; a atual mostra "—".
+    """
+    a = novo.set_index("url_id").sort_index()
+    b = anterior.set_index("url_id").sort_index()
+    b["valor_total_fmt"] = b["valor_total_fmt"].replace("R$ nan", "—")
+    diferentes = []
+    for coluna in COLUNAS_COMPARADAS:
+        x = a[coluna].astype(object).where(a[coluna].notna(), None)
+        y = b[coluna].astype(object).where(b[coluna].notna(), None)
+        if not x.equals(y):
+            diferentes.append(f"{coluna} ({int((x != y).sum())} linhas)")
+    return diferentes
+
+
+def main():
+    print(f"{'editais':>9} {'itens':>9} {'anterior':>10} {'vetorizado':>11} {'ganho':>7}")
+    for n in TAMANHOS:
+        df_editais, df_itens = gerar_dados(n)
+        repeticoes = 3 if n <= 20_000 else 1
+        hoje = datetime.now()  # mesmo relógio nas duas versões: status/prazo comparáveis
+        t_antes, r_antes = medir(processar_dados_anterior, df_editais, df_itens, repeticoes, hoje)
+        t_novo, r_novo = medir(processar_dados, df_editais, df_itens, max(repeticoes, 3), hoje)
+        print(f"{n:>9,} {len(df_itens):>9,} {t_antes:>9.2f}s {t_novo:>10.3f}s {t_antes / t_novo:>6.0f}x")
+        diferentes = comparar(r_novo, r_antes)
+        if diferentes:
+            print(f"   ⚠️  saídas diferentes: {', '.join(diferentes)}")
+
+
+if __name__ == "__main__":
+    main()
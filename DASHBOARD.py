@@ -10,13 +10,20 @@ Melhorias v3:
 - Tabela de preços com UF + órgão + data (inteligência de mercado real)
 - Coluna Valor Total na tabela principal
 - Segundo gráfico: Valor por UF e Valor por Modalidade
+- processar_dados vetorizado, em dashboard_dados.py (BENCH_DASHBOARD.py mede)
+- Carga paginada (faixas Range em paralelo) e incremental por updated_at/created_at
+- Filtro de itens (palavras-chave, quantidade) e seleção de colunas feitos no Supabase
+- Item principal e n_itens lidos da view editais_resumo_pncp (SUPABASE_RESUMO_EDITAIS.sql)
+- Cache único do processo (CacheDashboard), renovado em segundo plano: sessões não esperam o Supabase
 """
 
 import streamlit as st
-import requests
 import pandas as pd
 from datetime import datetime
 
+import radar_supabase
+from dashboard_dados import CacheDashboard, TabelaSincronizada
+
 # ─── Configuração ─────────────────────────────────────────────────────────────
 st.set_page_config(
     page_title="Radar FarmaUSA - Licitações Cannabis",
@@ -35,6 +42,10 @@ HEADERS = {
 }
 
 QTD_MAX_RAZOAVEL = 100_000
+# Mesmos filtros da view editais_resumo_pncp (SUPABASE_RESUMO_EDITAIS.sql)
+KEYWORDS_CANNABIS = ["canabidiol", "cannabis", "cbd", "cannabidiol", "thc", "cânhamo", "extrato medicinal"]
+# Colunas de itens_pncp usadas pelo processar_dados e pela tabela de preços
+COLUNAS_ITENS = "edital_url_id,numero_item,descricao,quantidade,valor_unitario,valor_total"
 
 # ─── CSS customizado ──────────────────────────────────────────────────────────
 st.markdown("""
@@ -58,209 +69,38 @@ st.markdown("""
 
 CACHE_TTL = 120  # segundos
 
-@st.cache_data(ttl=CACHE_TTL)
-def carregar_editais():
-    try:
-        url = f"{SUPABASE_URL}/rest/v1/editais_pncp?select=*&order=data_publicacao.desc"
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        return pd.DataFrame(r.json())
-    except Exception as e:
-        st.error(f"Erro ao carregar editais: {e}")
-        return pd.DataFrame()
-
-
-@st.cache_data(ttl=CACHE_TTL)
-def carregar_itens():
-    try:
-        url = f"{SUPABASE_URL}/rest/v1/itens_pncp?select=*"
-        r = requests.get(url, headers=HEADERS, timeout=15)
-        r.raise_for_status()
-        df = pd.DataFrame(r.json())
-        if df.empty:
-            return pd.DataFrame()
-
-        if "quantidade" in df.columns:
-            df = df[df["quantidade"].fillna(0) <= QTD_MAX_RAZOAVEL]
-
-        keywords_cannabis = ["canabidiol", "cannabis", "cbd", "cannabidiol", "thc", "cânhamo", "extrato medicinal"]
-        if "descricao" in df.columns:
-            mask = df["descricao"].str.lower().apply(
-                lambda x: any(k in str(x) for k in keywords_cannabis)
-            )
-            df = df[mask]
-
-        return df
-    except Exception as e:
-        st.error(f"Erro ao carregar itens: {e}")
-        return pd.DataFrame()
-
-
-def processar_dados(df_editais, df_itens):
-    if df_editais.empty:
-        return pd.DataFrame()
-
-    hoje = datetime.now()  # naive, sem timezone (compatível com datas convertidas)
-
-    def parse_dt(col):
-        """Converte coluna de data do Supabase para datetime naive, tratando mixed timezones."""
-        from zoneinfo import ZoneInfo
-        tz_br = ZoneInfo("America/Sao_Paulo")
-        def _parse_single(val):
-            if not val or pd.isna(val):
-                return pd.NaT
-            try:
-                dt = pd.to_datetime(val)
-                if dt.tzinfo is not None:
-                    dt = dt.tz_convert(tz_br).replace(tzinfo=None)
-                return dt
-            except Exception:
-                return pd.NaT
-        return pd.Series([_parse_single(v) for v in col], index=col.index)
-
-    df_editais["dt_fim"] = parse_dt(df_editais["data_fim"])
-    df_editais["dt_inicio"] = parse_dt(df_editais["data_inicio"])
-    df_editais["dt_pub"] = parse_dt(df_editais["data_publicacao"])
-
-    def calcular_status(row):
-        if pd.isna(row["dt_fim"]):
-            return "⚪ Sem data"
-        diff_h = (row["dt_fim"] - hoje).total_seconds() / 3600
-        if diff_h < 0:
-            return "🔴 Encerrado"
-        elif diff_h <= 72:
-            return "⚠️ Urgente"
-        else:
-            return "✅ Aberto"
-
-    def calcular_prazo_texto(row):
-        if pd.isna(row["dt_fim"]):
-            return "—"
-        diff_h = (row["dt_fim"] - hoje).total_seconds() / 3600
-        if diff_h < 0:
-            dias = int(abs(diff_h) // 24)
-            return f"Encerrou há {dias}d"
-        elif diff_h < 24:
-            return f"⚠️ {int(diff_h)}h restantes"
-        else:
-            dias = int(diff_h // 24)
-            return f"{dias} dias"
-
-    df_editais["status"] = df_editais.apply(calcular_status, axis=1)
-    df_editais["prazo"] = df_editais.apply(calcular_prazo_texto, axis=1)
-
-    def montar_link(url_id):
-        if not url_id:
-            return ""
-        partes = str(url_id).strip("/").split("/")
-        if len(partes) >= 4 and partes[0] == "compras":
-            return f"https://pncp.gov.br/app/editais/{partes[1]}/{partes[2]}/{partes[3]}"
-        return f"https://pncp.gov.br/app/editais{url_id}"
-
-    df_editais["link_pncp"] = df_editais["url_id"].apply(montar_link)
-
-    df_editais["Abertura"] = df_editais["dt_inicio"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
-    df_editais["Encerramento"] = df_editais["dt_fim"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
-    df_editais["Publicação"] = df_editais["dt_pub"].dt.strftime("%d/%m/%Y").fillna("—")
-
-    # JOIN com itens — item principal = maior valor total do edital
-    if not df_itens.empty and "edital_url_id" in df_itens.columns:
-        df_itens_v = df_itens.copy()
-
-        # Valor por item: usa campo direto ou qtd × preço unitário
-        def _valor_item(row):
-            try:
-                vt = float(row.get("valor_total") or 0)
-                if vt > 0:
-                    return vt
-            except Exception:
-                pass
-            try:
-                return float(row.get("valor_unitario") or 0) * float(row.get("quantidade") or 0)
-            except Exception:
-                return 0.0
-
-        df_itens_v["_valor_item"] = df_itens_v.apply(_valor_item, axis=1)
-
-        # Item principal = item de maior valor dentro do edital
-        # sort + drop_duplicates é mais seguro que idxmax+loc (sem dependência de índice)
-        df_principal = (
-            df_itens_v
-            .sort_values("_valor_item", ascending=False)
-            .drop_duplicates(subset="edital_url_id", keep="first")
-            .copy()
-        )
-        df_principal = df_principal.rename(columns={
-            "edital_url_id":  "url_id",
-            "descricao":      "_descricao_principal",
-            "quantidade":     "_qtd_principal",
-            "valor_unitario": "_preco_unit_principal",
-            "valor_total":    "_valor_total_principal",
-        })
-
-        # Contagem total de itens por edital (informativo)
-        n_itens_agg = df_itens.groupby("edital_url_id").size().reset_index(name="n_itens")
-        n_itens_agg.rename(columns={"edital_url_id": "url_id"}, inplace=True)
-
-        df = df_editais.merge(
-            df_principal[["url_id", "_descricao_principal", "_qtd_principal",
-                          "_preco_unit_principal", "_valor_total_principal", "_valor_item"]],
-            on="url_id", how="left"
-        ).merge(n_itens_agg, on="url_id", how="left")
-
-        df["qtd_total"]      = df["_qtd_principal"]
-        df["preco_unit_max"] = df["_preco_unit_principal"]
-        df["preco_unit_min"] = df["_preco_unit_principal"]
-    else:
-        df = df_editais.copy()
-        df["_descricao_principal"]  = ""
-        df["_qtd_principal"]        = None
-        df["_preco_unit_principal"] = None
-        df["_valor_total_principal"]= None
-        df["_valor_item"]           = 0.0
-        df["qtd_total"]             = 0
-        df["n_itens"]               = 0
-        df["preco_unit_max"]        = None
-        df["preco_unit_min"]        = None
-
-    def resumir_produto(row):
-        desc = str(row.get("_descricao_principal", "") or "")
-        if desc and len(desc) > 5:
-            return desc[:120]
-        return str(row.get("objeto", row.get("titulo", "—")) or "—")[:120]
-
-    df["produto"] = df.apply(resumir_produto, axis=1)
-
-    def formatar_preco(val):
-        if pd.isna(val) or val is None:
-            return "—"
-        return f"R$ {float(val):,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-    df["preco_unit_fmt"] = df["preco_unit_max"].apply(formatar_preco)
-
-    df["qtd_fmt"] = df["qtd_total"].apply(
-        lambda x: f"{int(x):,}".replace(",", ".") if pd.notna(x) and x > 0 else "—"
-    )
 
-    # Valor total formatado — usa valor do item principal (coerente com qtd/preço exibidos)
-    # Fallback para valor_total_estimado do edital se item não tiver valor
-    def formatar_valor_total(val):
-        try:
-            f = float(val)
-            if f <= 0:
-                return "—"
-            return f"R$ {f:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-        except Exception:
-            return "—"
-
-    df["_valor_exib"] = df["_valor_total_principal"].fillna(df["_valor_item"])
-    # Se item não tem valor, cai para valor_total_estimado do edital
-    df["_valor_exib"] = df["_valor_exib"].where(
-        df["_valor_exib"].fillna(0) > 0, df["valor_total_estimado"]
-    )
-    df["valor_total_fmt"] = df["_valor_exib"].apply(formatar_valor_total)
+@st.cache_resource
+def tabelas():
+    """Uma TabelaSincronizada por tabela, compartilhada por todas as sessões do processo."""
+    return {
+        "editais": TabelaSincronizada(
+            f"{SUPABASE_URL}/rest/v1/editais_pncp", HEADERS,
+            chave="url_id", ordem="data_publicacao.desc,url_id",
+        ),
+        "itens": TabelaSincronizada(
+            f"{SUPABASE_URL}/rest/v1/itens_pncp", HEADERS,
+            chave=["edital_url_id", "numero_item"], ordem="edital_url_id,numero_item",
+            colunas=COLUNAS_ITENS,
+            # Filtros no banco: só itens de cannabis e com quantidade plausível (ou sem quantidade)
+            filtros={
+                "or": radar_supabase.filtro_contem_algum("descricao", KEYWORDS_CANNABIS),
+                "and": f"(or(quantidade.lte.{QTD_MAX_RAZOAVEL},quantidade.is.null))",
+            },
+        ),
+        # Item principal / n_itens por edital, agregados no banco (SUPABASE_RESUMO_EDITAIS.sql)
+        "resumo": TabelaSincronizada(
+            f"{SUPABASE_URL}/rest/v1/editais_resumo_pncp", HEADERS,
+            chave="url_id", ordem="url_id",
+        ),
+    }
 
-    return df
+
+@st.cache_resource
+def cache_dados():
+    """DataFrame processado, compartilhado pelas sessões e renovado em segundo plano a cada CACHE_TTL."""
+    t = tabelas()
+    return CacheDashboard(t["editais"], t["itens"], t["resumo"], intervalo=CACHE_TTL)
 
 
 # ─── Interface ────────────────────────────────────────────────────────────────
@@ -268,17 +108,19 @@ def processar_dados(df_editais, df_itens):
 st.title("🌿 Radar de Licitações — Cannabis Medicinal")
 st.caption("Monitoramento em tempo real de oportunidades no PNCP para a equipe comercial.")
 
+# Só a primeira sessão do processo espera a carga; as demais leem o último retrato pronto
 with st.spinner("Carregando dados..."):
-    df_editais = carregar_editais()
-    df_itens = carregar_itens()
-    if "ts_carregamento" not in st.session_state:
-        st.session_state["ts_carregamento"] = datetime.now()
+    retrato = cache_dados().obter()
+
+for erro in (retrato["erros"] if retrato else []):
+    st.error(f"Erro ao carregar {erro}")
 
-if df_editais.empty:
+if retrato is None or retrato["df"].empty:
     st.info("O banco de dados está vazio ou ainda sendo atualizado.")
     st.stop()
 
-df = processar_dados(df_editais, df_itens)
+df = retrato["df"]
+df_itens = retrato["itens"]
 
 # ─── Sidebar — Filtros ────────────────────────────────────────────────────────
 with st.sidebar:
@@ -299,17 +141,18 @@ with st.sidebar:
     st.divider()
 
     # Indicador de cache
-    ts_carregamento = st.session_state.get("ts_carregamento", datetime.now())
-    segundos_passados = int((datetime.now() - ts_carregamento).total_seconds())
+    atualizado_em = retrato["atualizado_em"]
+    segundos_passados = int((datetime.now() - atualizado_em).total_seconds())
     segundos_restantes = max(0, CACHE_TTL - segundos_passados)
     st.caption(
-        f"Atualizado: {ts_carregamento.strftime('%d/%m/%Y %H:%M')}  \n"
-        f"Cache expira em ~{segundos_restantes}s"
+        f"Atualizado: {atualizado_em.strftime('%d/%m/%Y %H:%M')}  \n"
+        + ("Atualizando em segundo plano..." if cache_dados().atualizando
+           else f"Próxima atualização em ~{segundos_restantes}s")
     )
     if st.button("🔄 Recarregar dados"):
-        st.cache_data.clear()
-        st.session_state["ts_carregamento"] = datetime.now()
-        st.rerun()
+        # Pede uma atualização já; os dados atuais seguem no ar até a nova versão ficar pronta
+        cache_dados().solicitar_atualizacao()
+        st.toast("🔄 Atualização solicitada — os dados novos aparecem no próximo recarregamento da página.")
 
 # ─── Aplicar filtros ──────────────────────────────────────────────────────────
 df_f = df.copy()
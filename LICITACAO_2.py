@@ -25,9 +25,15 @@ import sys
 import re
 import requests
 import datetime
-import time
 import logging
 
+import radar_busca
+import radar_cache
+import radar_http
+import radar_match
+import radar_supabase
+import radar_telegram
+
 # ================= LOGGING =================
 logging.basicConfig(
     level=logging.INFO,
@@ -370,25 +376,22 @@ def formatar_valor(val):
         return None
 
 
+# Autômato compilado uma vez no import: uma passada pelo texto em vez de um `in` por keyword
+MATCHER_KEYWORDS = radar_match.Matcher(KEYWORDS)
+MATCHER_KEYWORDS_FORTES = radar_match.Matcher(KEYWORDS[:20])
+MATCHER_MEDICAMENTOS = radar_match.Matcher(MEDICAMENTO_CATEGORIA)
+
+
 def keyword_match(texto):
-    if not texto:
-        return False
-    texto_lower = str(texto).lower()
-    for kw in KEYWORDS:
-        if kw.lower() in texto_lower:
-            return True
-    return False
+    return MATCHER_KEYWORDS.tem(texto)
 
 
 def identificar_medicamento(texto):
     """Identifica qual medicamento foi encontrado no texto e retorna (nome_comercial, categoria)"""
-    if not texto:
+    kw = MATCHER_MEDICAMENTOS.identificar(texto)
+    if kw is None:
         return None, None
-    texto_lower = str(texto).lower()
-    for kw, (nome, cat) in MEDICAMENTO_CATEGORIA.items():
-        if kw.lower() in texto_lower:
-            return nome, cat
-    return None, None
+    return MEDICAMENTO_CATEGORIA[kw]
 
 
 def montar_link_pncp(cnpj, ano, seq):
@@ -417,7 +420,7 @@ def classificar_modalidade(modalidade_nome):
 def buscar_datas_individuais(cnpj, ano, seq):
     url = f"https://pncp.gov.br/api/consulta/v1/orgaos/{cnpj}/compras/{ano}/{seq}"
     try:
-        r = requests.get(url, headers=PNCP_HEADERS, timeout=15, allow_redirects=True)
+        r = radar_cache.get(url, "compra", headers=PNCP_HEADERS, timeout=15, allow_redirects=True)
         if r.status_code == 200:
             dados = r.json()
             if isinstance(dados, dict):
@@ -437,8 +440,9 @@ def buscar_itens_relevantes(cnpj, ano, seq):
     valor_total = 0.0
 
     try:
-        r = requests.get(
+        r = radar_cache.get(
             url,
+            "itens",
             headers=PNCP_HEADERS,
             params={"pagina": 1, "tamanhoPagina": 500},
             timeout=15,
@@ -514,140 +518,100 @@ def buscar_itens_relevantes(cnpj, ano, seq):
 
 # ─── API SEARCH — busca por data de DIVULGAÇÃO no PNCP ─────────
 
-def buscar_search_api(keyword, data_fmt, pagina=1, tam_pagina=20):
-    url = "https://pncp.gov.br/api/search/"
-    params = {
-        "q": keyword,
-        "tipos_documento": "edital",
-        "ordenacao": "-data",
-        "pagina": pagina,
-        "tam_pagina": tam_pagina,
-    }
-    try:
-        r = requests.get(url, params=params, headers=PNCP_HEADERS, timeout=30)
-        if r.status_code == 200:
-            dados = r.json()
-            items = dados.get("items", [])
-            filtrados = [
-                i for i in items
-                if (i.get("data_publicacao_pncp") or "").startswith(data_fmt)
-            ]
-            return filtrados
-        return []
-    except requests.exceptions.Timeout:
-        log.warning(f"Timeout search keyword='{keyword}' pag={pagina}")
-        return []
-    except Exception as e:
-        log.error(f"Erro search API: {e}")
-        return []
-
-
-def normalizar_item_search(item):
-    cnpj = item.get("orgao_cnpj", "")
-    ano = item.get("ano", "")
-    seq = item.get("numero_sequencial", "")
-    return {
-        "objetoCompra": item.get("description", item.get("title", "")),
-        "orgaoEntidade": {
-            "cnpj": cnpj,
-            "razaoSocial": item.get("orgao_nome", ""),
-        },
-        "unidadeOrgao": {
-            "ufSigla": item.get("uf", ""),
-            "municipioNome": item.get("municipio_nome", ""),
-        },
-        "anoCompra": ano,
-        "sequencialCompra": seq,
-        "modalidadeNome": item.get("modalidade_licitacao_nome", ""),
-        "dataPublicacaoPncp": item.get("data_publicacao_pncp"),
-        "dataAberturaProposta": item.get("data_inicio_vigencia"),
-        "dataEncerramentoProposta": item.get("data_fim_vigencia"),
-        "valorTotalEstimado": item.get("valor_total_estimado"),
-        "numeroCompra": item.get("numero_sequencial", ""),
-        "numeroControlePNCP": item.get("item_url", ""),
-        "linkSistemaOrigem": "",
-        "_source": "search",
-    }
-
-
 def buscar_por_search(data_str):
+    """Busca todas as licitações de medicamentos estratégicos divulgadas no dia via API search."""
     data_fmt = datetime.datetime.strptime(data_str, "%Y%m%d").strftime("%Y-%m-%d")
-    todos = {}
-
-    for kw in KEYWORDS_BUSCA:
-        log.info(f"   🔍 Search '{kw}'...")
-        pagina = 1
-        while True:
-            items = buscar_search_api(kw, data_fmt, pagina=pagina)
-            for item in items:
-                cnpj = item.get("orgao_cnpj", "")
-                ano = item.get("ano", "")
-                seq = item.get("numero_sequencial", "")
-                if cnpj and ano and seq:
-                    url_id = f"/compras/{cnpj}/{ano}/{seq}"
-                    if url_id not in todos:
-                        todos[url_id] = normalizar_item_search(item)
-            if len(items) < 20:
-                break
-            pagina += 1
-            time.sleep(0.2)
-            if pagina > 10:
-                break
-
+    todos = radar_busca.buscar_por_termos(KEYWORDS_BUSCA, data_fmt)
     log.info(f"   📋 Search encontrou: {len(todos)} editais únicos divulgados em {data_fmt}")
     return list(todos.values())
 
 
 # ================= SUPABASE =================
 
-def check_and_save_supabase(dados_edital, dados_itens):
+def buscar_existentes_supabase(contratacoes):
+    """Pré-verificação do dia: {url_id: registro} de todas as contratações em poucas consultas."""
+    return radar_supabase.buscar_existentes_contratacoes(
+        f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}", SUPABASE_HEADERS, contratacoes)
+
+
+def criar_buffer_gravacao():
+    """Buffer de upserts em lote para editais/itens novos (descarregado por tamanho e ao fim do dia)."""
+    return radar_supabase.BufferGravacao(
+        f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}",
+        f"{SUPABASE_URL}/rest/v1/{TABELA_ITENS}",
+        SUPABASE_HEADERS,
+    )
+
+
+def check_and_save_supabase(dados_edital, dados_itens, existentes=None, gravacao=None, ao_salvar=None):
     url_id = dados_edital["url_id"]
     endpoint_editais = f"{SUPABASE_URL}/rest/v1/{TABELA_EDITAIS}"
     endpoint_itens = f"{SUPABASE_URL}/rest/v1/{TABELA_ITENS}"
 
     dados_para_salvar = {k: v for k, v in dados_edital.items() if not k.startswith("_")}
 
-    try:
-        check = requests.get(
-            f"{endpoint_editais}?url_id=eq.{requests.utils.quote(url_id)}&select=url_id,data_inicio,data_fim,data_publicacao",
-            headers=SUPABASE_HEADERS,
-            timeout=10
-        )
-        if check.status_code == 200 and len(check.json()) > 0:
-            registro = check.json()[0]
-
-            if ATUALIZAR_DATAS:
-                campos_atualizar = {}
-                if not registro.get("data_inicio") and dados_para_salvar.get("data_inicio"):
-                    campos_atualizar["data_inicio"] = dados_para_salvar["data_inicio"]
-                if not registro.get("data_fim") and dados_para_salvar.get("data_fim"):
-                    campos_atualizar["data_fim"] = dados_para_salvar["data_fim"]
-                if not registro.get("data_publicacao") and dados_para_salvar.get("data_publicacao"):
-                    campos_atualizar["data_publicacao"] = dados_para_salvar["data_publicacao"]
-
-                if campos_atualizar:
-                    patch = requests.patch(
+    registro = None
+    if existentes is not None:
+        # Pré-verificação em lote já feita para o dia — consulta local
+        registro = existentes.get(url_id)
+    else:
+        try:
+            check = radar_http.get(
+                f"{endpoint_editais}?url_id=eq.{requests.utils.quote(url_id)}&select=url_id,data_inicio,data_fim,data_publicacao",
+                headers=SUPABASE_HEADERS,
+                timeout=10
+            )
+            if check.status_code == 200 and len(check.json()) > 0:
+                registro = check.json()[0]
+        except Exception as e:
+            log.warning(f"Aviso ao verificar Supabase: {e}")
+
+    if registro is not None:
+        if ATUALIZAR_DATAS:
+            campos_atualizar = {}
+            if not registro.get("data_inicio") and dados_para_salvar.get("data_inicio"):
+                campos_atualizar["data_inicio"] = dados_para_salvar["data_inicio"]
+            if not registro.get("data_fim") and dados_para_salvar.get("data_fim"):
+                campos_atualizar["data_fim"] = dados_para_salvar["data_fim"]
+            if not registro.get("data_publicacao") and dados_para_salvar.get("data_publicacao"):
+                campos_atualizar["data_publicacao"] = dados_para_salvar["data_publicacao"]
+
+            if campos_atualizar:
+                try:
+                    patch = radar_http.patch(
                         f"{endpoint_editais}?url_id=eq.{requests.utils.quote(url_id)}",
                         headers={**SUPABASE_HEADERS, "Prefer": "return=minimal"},
                         json=campos_atualizar,
                         timeout=10
                     )
                     if patch.status_code in [200, 204]:
+                        registro.update(campos_atualizar)
                         log.info(f"📅 Datas atualizadas: {url_id} → {list(campos_atualizar.keys())}")
                     else:
                         log.warning(f"Erro PATCH datas: {patch.status_code} {patch.text[:200]}")
-                else:
-                    log.info(f"⏭️  Já existe com datas completas: {url_id}")
+                except Exception as e:
+                    log.warning(f"Erro PATCH datas ({url_id}): {e}")
             else:
-                log.info(f"⏭️  Já existe no banco: {url_id}")
+                log.info(f"⏭️  Já existe com datas completas: {url_id}")
+        else:
+            log.info(f"⏭️  Já existe no banco: {url_id}")
 
-            return False
-    except Exception as e:
-        log.warning(f"Aviso ao verificar Supabase: {e}")
+        return False
+
+    if gravacao is not None:
+        # Gravação em lote: só depois do edital e dos itens confirmados ele entra
+        # em `existentes` e o alerta (ao_salvar) sai
+        def confirmado():
+            if existentes is not None:
+                existentes[url_id] = {c: dados_para_salvar.get(c) for c in radar_supabase.CAMPOS_EXISTENTES}
+            if ao_salvar:
+                ao_salvar()
+
+        return gravacao.adicionar(dados_para_salvar, dados_itens, ao_salvar=confirmado)
 
     headers_upsert = {**SUPABASE_HEADERS, "Prefer": "resolution=merge-duplicates,return=minimal"}
     try:
-        res = requests.post(
+        res = radar_http.post(
             f"{endpoint_editais}?on_conflict=url_id",
             headers=headers_upsert,
             json=dados_para_salvar,
@@ -657,6 +621,8 @@ def check_and_save_supabase(dados_edital, dados_itens):
             log.error(f"ERRO upsert ({url_id}): {res.status_code} - {res.text[:300]}")
             return False
         log.info(f"✅ Supabase NOVO salvo: {url_id}")
+        if existentes is not None:
+            existentes[url_id] = {c: dados_para_salvar.get(c) for c in radar_supabase.CAMPOS_EXISTENTES}
     except Exception as e:
         log.error(f"ERRO request Supabase ({url_id}): {e}")
         return False
@@ -665,7 +631,7 @@ def check_and_save_supabase(dados_edital, dados_itens):
         try:
             for item in dados_itens:
                 item["edital_url_id"] = url_id
-            res_itens = requests.post(
+            res_itens = radar_http.post(
                 endpoint_itens,
                 headers={**SUPABASE_HEADERS, "Prefer": "return=minimal"},
                 json=dados_itens,
@@ -678,11 +644,22 @@ def check_and_save_supabase(dados_edital, dados_itens):
         except Exception as e:
             log.warning(f"Erro ao inserir itens: {e}")
 
+    if ao_salvar:
+        ao_salvar()
     return True
 
 
 # ================= TELEGRAM =================
 
+# Alertas da execução: os TELEGRAM_DIGEST_MINIMO primeiros editais novos saem na
+# hora, um a um; depois, em digest agrupado por categoria do medicamento
+ALERTAS = radar_telegram.Alertas(
+    TELEGRAM_BOT_TOKEN, CHAT_ID,
+    "🏥 <b>NOVAS LICITAÇÕES — MEDICAMENTO ESTRATÉGICO</b>",
+    rodape=f'📊 <a href="{DASHBOARD_URL}">igdata.com.br</a>\n\n<i>Alerta automático — Radar NSC</i>',
+)
+
+
 def enviar_telegram(edital, itens_texto, modalidade_label):
     cnpj = edital.get("_cnpj", "")
     ano = edital.get("_ano", "")
@@ -757,28 +734,15 @@ def enviar_telegram(edital, itens_texto, modalidade_label):
         f"<i>Alerta automático — Radar NSC</i>"
     )
 
-    try:
-        resp = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-            json={
-                "chat_id": CHAT_ID,
-                "text": msg,
-                "parse_mode": "HTML",
-                "disable_web_page_preview": True,
-            },
-            timeout=10,
-        )
-        if resp.status_code == 200:
-            log.info(f"🚀 Telegram enviado: {titulo[:60]}")
-        else:
-            log.error(f"Telegram erro {resp.status_code}: {resp.text[:200]}")
-    except Exception as e:
-        log.error(f"Telegram request falhou: {e}")
+    nomes = " | ".join(sorted(medicamentos_encontrados))
+    linha = radar_telegram.linha_digest(link_pncp, orgao, titulo, nomes and f"💊 {nomes}", uf, prazo_txt)
+    ALERTAS.adicionar(categoria_principal or "Outros", linha, msg, descricao=titulo,
+                      disable_web_page_preview=True)
 
 
 # ================= PROCESSAMENTO =================
 
-def processar_contratacao(item):
+def processar_contratacao(item, existentes=None, gravacao=None, enriquecido=None):
     objeto = item.get("objetoCompra", "")
 
     from_search = item.get("_source") == "search"
@@ -799,27 +763,25 @@ def processar_contratacao(item):
 
     url_id = f"/compras/{cnpj}/{ano}/{seq}"
 
+    # Datas e itens vêm do enriquecimento em lote do dia; sem ele, busca aqui mesmo
+    if enriquecido is None:
+        enriquecido = radar_busca.enriquecer_contratacao(item, buscar_datas_individuais, buscar_itens_relevantes)
+
     data_inicio = item.get("dataAberturaProposta")
     data_fim = item.get("dataEncerramentoProposta")
+    di, df = enriquecido["datas"]
+    if di:
+        data_inicio = di
+    if df:
+        data_fim = df
 
-    if not data_inicio or not data_fim:
-        log.info(f"   🔍 Buscando datas individuais para {cnpj}/{ano}/{seq}...")
-        di, df = buscar_datas_individuais(cnpj, ano, seq)
-        if di:
-            data_inicio = di
-        if df:
-            data_fim = df
-        time.sleep(0.3)
-
-    itens_texto, itens_banco, valor_itens = buscar_itens_relevantes(cnpj, ano, seq)
-    time.sleep(0.3)
+    itens_texto, itens_banco, valor_itens = enriquecido["itens"]
 
     if not itens_banco:
         if from_search:
             log.info(f"   ⚠️  API de itens vazia mas origem é search PNCP — salvando com fallback")
         else:
-            objeto_lower = objeto.lower()
-            tem_keyword_forte = any(kw.lower() in objeto_lower for kw in KEYWORDS[:20])
+            tem_keyword_forte = MATCHER_KEYWORDS_FORTES.tem(objeto)
             if tem_keyword_forte:
                 log.info(f"   ⚠️  API de itens vazia mas objeto menciona keyword — salvando com fallback")
             else:
@@ -857,16 +819,14 @@ def processar_contratacao(item):
         "_seq": str(seq),
     }
 
-    if check_and_save_supabase(dados_edital, itens_banco):
+    def ao_salvar():
         if APENAS_POPULAR_BANCO:
             log.info(f"   📦 Salvo no banco (modo recuperação — Telegram suprimido)")
         else:
             modalidade_label = classificar_modalidade(modalidade_nome)
             enviar_telegram(dados_edital, itens_texto, modalidade_label)
-            time.sleep(0.5)
-        return True
 
-    return False
+    return check_and_save_supabase(dados_edital, itens_banco, existentes, gravacao, ao_salvar)
 
 
 # ================= RESUMO DIÁRIO =================
@@ -878,7 +838,7 @@ def enviar_resumo_dia():
     endpoint_itens = f"{SUPABASE_URL}/rest/v1/{TABELA_ITENS}"
 
     try:
-        r = requests.get(
+        r = radar_http.get(
             endpoint_editais,
             headers={
                 "apikey": SUPABASE_KEY,
@@ -902,19 +862,20 @@ def enviar_resumo_dia():
             f"Nenhuma licitação de medicamento estratégico encontrada hoje.\n\n"
             f"<i>Radar NSC — igdata.com.br</i>"
         )
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                json={"chat_id": CHAT_ID, "text": msg, "parse_mode": "HTML"},
-                timeout=10,
-            )
-        except Exception as e:
-            log.warning(f"Erro ao enviar resumo: {e}")
+        radar_telegram.enviar(TELEGRAM_BOT_TOKEN, CHAT_ID, msg, descricao="resumo do dia (sem editais)")
         return
 
     blocos = []
     valor_dia = 0.0
 
+    # Itens de todos os editais do dia numa consulta só (edital_url_id=in.(...))
+    itens_por_edital = radar_supabase.buscar_itens_por_edital(
+        endpoint_itens,
+        {"apikey": SUPABASE_KEY, "Authorization": f"Bearer {SUPABASE_KEY}"},
+        [e.get("url_id") for e in editais],
+        colunas="descricao,quantidade,valor_unitario",
+    )
+
     for i, edital in enumerate(editais, 1):
         url_id = edital.get("url_id", "")
         orgao = edital.get("orgao", "N/A")
@@ -935,22 +896,7 @@ def enviar_resumo_dia():
 
         linhas = [cabecalho, f"🏢 {orgao}"]
 
-        try:
-            ri = requests.get(
-                endpoint_itens,
-                headers={
-                    "apikey": SUPABASE_KEY,
-                    "Authorization": f"Bearer {SUPABASE_KEY}",
-                },
-                params={
-                    "edital_url_id": f"eq.{url_id}",
-                    "select": "descricao,quantidade,valor_unitario",
-                },
-                timeout=10,
-            )
-            itens = ri.json() if ri.status_code == 200 else []
-        except Exception:
-            itens = []
+        itens = itens_por_edital.get(url_id, [])
 
         for item in itens[:5]:
             desc = (item.get("descricao") or "")[:80]
@@ -995,15 +941,67 @@ def enviar_resumo_dia():
         f"<i>Radar NSC — igdata.com.br</i>"
     )
 
-    try:
-        requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-            json={"chat_id": CHAT_ID, "text": msg, "parse_mode": "HTML", "disable_web_page_preview": True},
-            timeout=10,
-        )
-        log.info(f"📊 Resumo diário enviado — {len(editais)} edital(is).")
-    except Exception as e:
-        log.warning(f"Erro ao enviar resumo diário: {e}")
+    radar_telegram.enviar(TELEGRAM_BOT_TOKEN, CHAT_ID, msg, descricao=f"resumo diário — {len(editais)} edital(is)", disable_web_page_preview=True)
+
+
+# ================= EXECUÇÃO =================
+
+def processar_dia(contratacoes, gravacao):
+    """
+    Pré-verificação no banco, enriquecimento e processamento das contratações
+    de um dia (já buscadas). Usado pelo main e pelo RADAR_COMBINADO.py.
+    """
+    existentes = buscar_existentes_supabase(contratacoes)
+    enriquecidos = radar_busca.enriquecer_contratacoes(
+        contratacoes, keyword_match, objeto_bloqueado, buscar_datas_individuais, buscar_itens_relevantes)
+
+    for item, enriquecido in zip(contratacoes, enriquecidos):
+        log.info(f"   🎯 Match search: {item.get('objetoCompra', '')[:80]}...")
+        processar_contratacao(item, existentes, gravacao, enriquecido)
+
+    gravacao.flush()
+    return len(contratacoes)
+
+
+def finalizar(total_analisadas, total_encontradas, gravacao):
+    """Resumo da execução, resumo diário e mensagens de fechamento."""
+    total_novas = gravacao.inseridos
+
+    log.info(f"💾 Gravação: {gravacao.resumo()}")
+    log.info("📊 RESUMO:")
+    log.info(f"   Analisadas:             {total_analisadas}")
+    log.info(f"   Com med. estratégico:   {total_encontradas}")
+    log.info(f"   Novas (Telegram):       {total_novas}")
+    log.info(f"   Já conhecidas:          {total_encontradas - total_novas}")
+    log.info("=" * 60)
+
+    # Mensagem de varredura concluída
+    if TELEGRAM_BOT_TOKEN and CHAT_ID and not APENAS_POPULAR_BANCO:
+        agora_fmt = datetime.datetime.now().strftime("%d/%m/%Y %H:%M")
+        if total_novas > 0:
+            msg_fechamento = (
+                f"✅ <b>Varredura concluída</b> — {agora_fmt}\n\n"
+                f"📊 Analisadas: {total_analisadas:,}\n"
+                f"🏥 Com medicamento estratégico: {total_encontradas}\n"
+                f"🆕 Novas enviadas: <b>{total_novas}</b>\n\n"
+                f"<i>Radar NSC — igdata.com.br</i>"
+            )
+        else:
+            msg_fechamento = (
+                f"🔍 <b>Varredura concluída</b> — {agora_fmt}\n\n"
+                f"Nenhuma licitação nova encontrada nesta execução.\n"
+                f"📊 {total_analisadas:,} editais analisados.\n\n"
+                f"<i>Radar NSC — igdata.com.br</i>"
+            )
+        # Digest de alertas pendente, com o fechamento dentro da última mensagem
+        ALERTAS.enviar(anexo=msg_fechamento)
+    else:
+        ALERTAS.enviar()
+
+    # Resumo diário — envia apenas na execução das 18h+ Brasília (21h+ UTC)
+    if TELEGRAM_BOT_TOKEN and CHAT_ID and not APENAS_POPULAR_BANCO:
+        if datetime.datetime.utcnow().hour >= 21:
+            enviar_resumo_dia()
 
 
 # ================= MAIN =================
@@ -1043,62 +1041,28 @@ def main():
 
     total_analisadas = 0
     total_encontradas = 0
-    total_novas = 0
-
-    for dia in dias:
-        dia_str = dia.strftime("%Y%m%d")
-        log.info(f"\n📆 Processando dia: {dia.strftime('%d/%m/%Y')}")
-
-        contratacoes = buscar_por_search(dia_str)
-        total_analisadas += len(contratacoes)
-
-        for item in contratacoes:
-            total_encontradas += 1
-            log.info(f"   🎯 Match search: {item.get('objetoCompra', '')[:80]}...")
-            if processar_contratacao(item):
-                total_novas += 1
-
-        time.sleep(0.3)
-
-    log.info("=" * 60)
-    log.info("📊 RESUMO:")
-    log.info(f"   Analisadas:             {total_analisadas}")
-    log.info(f"   Com med. estratégico:   {total_encontradas}")
-    log.info(f"   Novas (Telegram):       {total_novas}")
-    log.info(f"   Já conhecidas:          {total_encontradas - total_novas}")
-    log.info("=" * 60)
-
-    # Resumo diário — envia apenas na execução das 18h+ Brasília (21h+ UTC)
-    if TELEGRAM_BOT_TOKEN and CHAT_ID and not APENAS_POPULAR_BANCO:
-        if datetime.datetime.utcnow().hour >= 21:
-            enviar_resumo_dia()
-
-    # Mensagem de varredura concluída
-    if TELEGRAM_BOT_TOKEN and CHAT_ID and not APENAS_POPULAR_BANCO:
-        agora_fmt = datetime.datetime.now().strftime("%d/%m/%Y %H:%M")
-        if total_novas > 0:
-            msg_fechamento = (
-                f"✅ <b>Varredura concluída</b> — {agora_fmt}\n\n"
-                f"📊 Analisadas: {total_analisadas:,}\n"
-                f"🏥 Com medicamento estratégico: {total_encontradas}\n"
-                f"🆕 Novas enviadas: <b>{total_novas}</b>\n\n"
-                f"<i>Radar NSC — igdata.com.br</i>"
-            )
-        else:
-            msg_fechamento = (
-                f"🔍 <b>Varredura concluída</b> — {agora_fmt}\n\n"
-                f"Nenhuma licitação nova encontrada nesta execução.\n"
-                f"📊 {total_analisadas:,} editais analisados.\n\n"
-                f"<i>Radar NSC — igdata.com.br</i>"
-            )
-        try:
-            requests.post(
-                f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-                json={"chat_id": CHAT_ID, "text": msg_fechamento, "parse_mode": "HTML"},
-                timeout=10,
-            )
-        except Exception as e:
-            log.warning(f"Erro ao enviar fechamento: {e}")
+    try:
+        gravacao = criar_buffer_gravacao()
+
+        for dia in dias:
+            dia_str = dia.strftime("%Y%m%d")
+            log.info(f"\n📆 Processando dia: {dia.strftime('%d/%m/%Y')}")
+
+            contratacoes = buscar_por_search(dia_str)
+            total_analisadas += len(contratacoes)
+            total_encontradas += processar_dia(contratacoes, gravacao)
+
+        log.info("=" * 60)
+        for linha in radar_http.resumo():
+            log.info(f"🌐 {linha}")
+        log.info(f"🗄️  Cache HTTP: {radar_cache.resumo()}")
+        log.info(f"🔎 Busca: {radar_busca.resumo()}")
+        finalizar(total_analisadas, total_encontradas, gravacao)
+    finally:
+        # Se a execução cair no meio, o digest pendente ainda sai (no fim
+        # normal ele já foi enviado e isto não manda nada)
+        ALERTAS.enviar()
+        radar_telegram.flush()
 
 
 if __name__ == "__main__":
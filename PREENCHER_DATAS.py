@@ -15,10 +15,11 @@ CORREÇÃO v3:
 
 import os
 import requests
-import time
 import logging
 import json
 
+import radar_http
+
 # ================= LOGGING =================
 logging.basicConfig(
     level=logging.INFO,
@@ -64,7 +65,7 @@ def buscar_registros_sem_datas():
             "order": "data_publicacao.asc",
         }
 
-        r = requests.get(endpoint, headers=headers, params=params, timeout=15)
+        r = radar_http.get(endpoint, headers=headers, params=params, timeout=15)
 
         if r.status_code == 200:
             dados = r.json()
@@ -99,7 +100,7 @@ def atualizar_supabase(url_id, data_inicio, data_fim):
     headers = SUPABASE_HEADERS.copy()
     headers["Prefer"] = "return=minimal"
 
-    r = requests.patch(
+    r = radar_http.patch(
         f"{endpoint}?url_id=eq.{requests.utils.quote(url_id, safe='')}",
         headers=headers,
         json=payload,
@@ -194,7 +195,7 @@ def buscar_datas_pncp(cnpj, ano, seq, debug=False):
 
     for i, url in enumerate(endpoints):
         try:
-            r = requests.get(
+            r = radar_http.get(
                 url,
                 headers=PNCP_HEADERS,
                 timeout=15,
@@ -247,8 +248,6 @@ def buscar_datas_pncp(cnpj, ano, seq, debug=False):
                 log.info(f"  [DEBUG] Erro endpoint {i+1}: {e}")
             continue
 
-        time.sleep(0.3)
-
     return None, None
 
 
@@ -304,8 +303,6 @@ def main():
             log.info(f"  ⚠️ Sem datas disponíveis na API")
             sem_dados += 1
 
-        time.sleep(0.4)
-
     log.info("=" * 60)
     log.info("📊 RESUMO:")
     log.info(f"   Total processados:  {len(registros)}")
@@ -0,0 +1,177 @@
+"""
+RADAR COMBINADO - Uma varredura da API search para os três radares
+==================================================================
+LICITACAO.PY (cannabis), LICITACAO_2.py (NSC) e LICITACAO_ALTOCUSTO.py rodam
+nos mesmos horários e buscam na API search do PNCP termos que se repetem entre
+eles (brivaracetam, Briviact, Biktarvy, Imbruvica...). Aqui cada termo único é
+buscado uma vez por dia e os resultados são distribuídos:
+
+- União dos KEYWORDS_BUSCA dos radares, deduplicada pela forma normalizada
+  (radar_match.normalizar)
+- Cada radar recebe os editais dos seus próprios termos (mesmo resultado da
+  execução isolada) e, dos demais, os que o seu keyword_match aceita no objeto
+- Cada edital segue pelo processar_dia do próprio radar: mesmas tabelas,
+  mesmo chat do Telegram, mesmo resumo diário e fechamento
+- Radar sem SUPABASE configurado é pulado sem derrubar os outros
+- RADARES_ATIVOS=cannabis,altocusto restringe a execução a alguns radares
+"""
+
+import datetime
+import importlib.machinery
+import importlib.util
+import logging
+import os
+import sys
+
+import radar_busca
+import radar_cache
+import radar_http
+import radar_match
+import radar_telegram
+
+# ================= LOGGING =================
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%H:%M:%S"
+)
+log = logging.getLogger("radar_combinado")
+
+# ================= CONFIGURAÇÕES =================
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+RADARES = [
+    ("cannabis", "LICITACAO.PY"),
+    ("nsc", "LICITACAO_2.py"),
+    ("altocusto", "LICITACAO_ALTOCUSTO.py"),
+]
+RADARES_ATIVOS = [r.strip() for r in os.environ.get("RADARES_ATIVOS", "").split(",") if r.strip()]
+
+
+# ================= RADARES =================
+
+def carregar_radar(nome, arquivo):
+    """Importa o script do radar como módulo (SourceFileLoader aceita a extensão .PY)."""
+    caminho = os.path.join(DIRETORIO, arquivo)
+    loader = importlib.machinery.SourceFileLoader(f"radar_{nome}", caminho)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    modulo = importlib.util.module_from_spec(spec)
+    loader.exec_module(modulo)
+    return modulo
+
+
+def carregar_radares():
+    radares = []
+    for nome, arquivo in RADARES:
+        if RADARES_ATIVOS and nome not in RADARES_ATIVOS:
+            continue
+        modulo = carregar_radar(nome, arquivo)
+        if not modulo.SUPABASE_URL or not modulo.SUPABASE_KEY:
+            log.error(f"❌ {nome}: Supabase não configurado — radar ignorado")
+            continue
+        if not modulo.TELEGRAM_BOT_TOKEN or not modulo.CHAT_ID:
+            log.warning(f"⚠️ {nome}: Telegram não configurado — alertas desativados")
+        radares.append({
+            "nome": nome,
+            "modulo": modulo,
+            "gravacao": modulo.criar_buffer_gravacao(),
+            "analisadas": 0,
+            "encontradas": 0,
+        })
+    return radares
+
+
+def unir_termos(radares):
+    """{forma normalizada: termo buscado}, na ordem em que aparecem nos radares."""
+    termos = {}
+    for radar in radares:
+        for kw in radar["modulo"].KEYWORDS_BUSCA:
+            termos.setdefault(radar_match.normalizar(kw), kw)
+    return termos
+
+
+def rotear(radar, resultados, termos):
+    """
+    Contratações do dia para `radar`: primeiro as dos seus próprios termos (na
+    ordem do KEYWORDS_BUSCA dele), depois as dos outros termos que o keyword_match
+    do radar aceita. Estas não têm _source="search" e passam pelas checagens de
+    objeto e itens como qualquer contratação que não veio da busca do radar.
+    """
+    modulo = radar["modulo"]
+    proprios = [termos[radar_match.normalizar(kw)] for kw in modulo.KEYWORDS_BUSCA]
+    contratacoes = radar_busca.mesclar(resultados, proprios)
+
+    cruzadas = 0
+    for termo, por_termo in resultados.items():
+        if termo in proprios:
+            continue
+        for url_id, item in por_termo.items():
+            if url_id in contratacoes or not modulo.keyword_match(item.get("objetoCompra", "")):
+                continue
+            contratacoes[url_id] = {**item, "_source": "busca_combinada"}
+            cruzadas += 1
+
+    log.info(f"   📦 {radar['nome']}: {len(contratacoes)} edital(is) "
+             f"({cruzadas} vindo(s) de termos de outros radares)")
+    return list(contratacoes.values())
+
+
+# ================= MAIN =================
+
+def main():
+    agora = datetime.datetime.now()
+    log.info("=" * 60)
+    log.info(f"🛰️  RADAR COMBINADO — uma busca PNCP para todos os radares")
+    log.info(f"⏰ Execução: {agora.strftime('%d/%m/%Y %H:%M:%S')}")
+    log.info("=" * 60)
+
+    radares = carregar_radares()
+    if not radares:
+        log.error("❌ Nenhum radar configurado!")
+        sys.exit(1)
+
+    termos = unir_termos(radares)
+    total_termos = sum(len(r["modulo"].KEYWORDS_BUSCA) for r in radares)
+    log.info(f"📡 Radares: {', '.join(r['nome'] for r in radares)}")
+    log.info(f"🔑 Keywords busca: {len(termos)} termos únicos (de {total_termos} somando os radares)")
+
+    hoje = datetime.date.today()
+
+    # Mesma janela dos radares: a primeira execução do dia (antes das 13 UTC)
+    # busca ontem + hoje; as demais, só hoje
+    hora_utc = datetime.datetime.utcnow().hour
+    retroativos = 1 if hora_utc < 13 else 0
+    dias = [hoje - datetime.timedelta(days=n) for n in range(retroativos, -1, -1)]
+    log.info(f"📅 Período: {dias[0].strftime('%d/%m/%Y')} a {hoje.strftime('%d/%m/%Y')}")
+
+    try:
+        for dia in dias:
+            data_fmt = dia.strftime("%Y-%m-%d")
+            log.info(f"\n📆 Processando dia: {dia.strftime('%d/%m/%Y')}")
+
+            resultados = radar_busca.buscar_termos(list(termos.values()), data_fmt)
+            unicos = {url_id for por_termo in resultados.values() for url_id in por_termo}
+            log.info(f"   📋 Search encontrou: {len(unicos)} editais únicos divulgados em {data_fmt}")
+
+            for radar in radares:
+                contratacoes = rotear(radar, resultados, termos)
+                radar["analisadas"] += len(contratacoes)
+                radar["encontradas"] += radar["modulo"].processar_dia(contratacoes, radar["gravacao"])
+
+        log.info("=" * 60)
+        for linha in radar_http.resumo():
+            log.info(f"🌐 {linha}")
+        log.info(f"🗄️  Cache HTTP: {radar_cache.resumo()}")
+        log.info(f"🔎 Busca: {radar_busca.resumo()}")
+        for radar in radares:
+            log.info(f"📡 Radar {radar['nome']}")
+            radar["modulo"].finalizar(radar["analisadas"], radar["encontradas"], radar["gravacao"])
+    finally:
+        # Se a execução cair no meio, o digest pendente de cada radar ainda sai
+        for radar in radares:
+            radar["modulo"].ALERTAS.enviar()
+        radar_telegram.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+-- =============================================================================
+-- RESUMO POR EDITAL - editais_resumo_pncp
+-- =============================================================================
+-- Agregado de itens_pncp por edital, lido pelo DASHBOARD.py no lugar do
+-- sort + drop_duplicates + groupby que o processar_dados fazia a cada rerun.
+--
+-- - Só itens de cannabis com quantidade plausível: mesmos filtros que o
+--   dashboard aplica na leitura de itens (KEYWORDS_CANNABIS, QTD_MAX_RAZOAVEL
+--   em DASHBOARD.py) — mantenha os dois em sincronia
+-- - Item principal = item de maior valor (valor_total > 0, senão
+--   valor_unitario × quantidade); itens sem valor vão para o fim
+-- - Atualizada pela função refresh_editais_resumo_pncp(), que os robôs que
+--   gravam itens_pncp (LICITACAO.PY, LICITACAO_VARREDURA.PY) chamam via
+--   /rest/v1/rpc/ ao fim de uma execução que gravou itens
+--
+-- Rodar uma vez no SQL Editor do Supabase (é idempotente).
+-- =============================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS editais_resumo_pncp;
+
+CREATE MATERIALIZED VIEW editais_resumo_pncp AS
+WITH itens AS (
+    SELECT
+        edital_url_id,
+        numero_item,
+        descricao,
+        quantidade,
+        valor_unitario,
+        valor_total,
+        CASE WHEN valor_total > 0 THEN valor_total
+             ELSE valor_unitario * quantidade END AS valor_item
+    FROM itens_pncp
+    WHERE descricao ILIKE ANY (ARRAY[
+              '%canabidiol%', '%cannabis%', '%cbd%', '%cannabidiol%',
+              '%thc%', '%cânhamo%', '%extrato medicinal%'
+          ])
+      AND (quantidade IS NULL OR quantidade <= 100000)
+),
+ordenados AS (
+    SELECT
+        itens.*,
+        ROW_NUMBER() OVER (PARTITION BY edital_url_id
+                           ORDER BY valor_item DESC NULLS LAST, numero_item) AS posicao,
+        COUNT(*) OVER (PARTITION BY edital_url_id) AS n_itens,
+        SUM(COALESCE(valor_item, 0)) OVER (PARTITION BY edital_url_id) AS valor_itens_total
+    FROM itens
+)
+SELECT
+    edital_url_id   AS url_id,
+    descricao       AS descricao_principal,
+    quantidade      AS qtd_principal,
+    valor_unitario  AS preco_unit_principal,
+    valor_total     AS valor_total_principal,
+    valor_item      AS valor_item_principal,
+    n_itens,
+    valor_itens_total
+FROM ordenados
+WHERE posicao = 1;
+
+-- Índice único: exigido pelo REFRESH ... CONCURRENTLY (leituras não bloqueiam)
+CREATE UNIQUE INDEX editais_resumo_pncp_url_id ON editais_resumo_pncp (url_id);
+
+GRANT SELECT ON editais_resumo_pncp TO anon, authenticated;
+
+-- Última atualização, para o limite de frequência da função abaixo (uma linha só)
+CREATE TABLE IF NOT EXISTS editais_resumo_pncp_refresh (
+    id     boolean PRIMARY KEY DEFAULT true CHECK (id),
+    ultima timestamptz NOT NULL
+);
+
+ALTER TABLE editais_resumo_pncp_refresh ENABLE ROW LEVEL SECURITY;
+REVOKE ALL ON editais_resumo_pncp_refresh FROM anon, authenticated;
+
+-- Os robôs gravam com a chave anon (o padrão de SUPABASE_KEY nos scripts), então
+-- a função precisa ficar exposta a anon em /rest/v1/rpc/ — e, com ela, a qualquer
+-- um que tenha a chave pública do dashboard.
+-- Como roda com os privilégios do dono (SECURITY DEFINER) e o REFRESH é caro,
+-- ela se limita: não atualiza se já houve atualização há menos de 60 s ou se
+-- outra está em andamento — só retorna. Um robô que termina logo depois de
+-- outro fica para a próxima atualização.
+CREATE OR REPLACE FUNCTION refresh_editais_resumo_pncp()
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+    IF NOT pg_try_advisory_xact_lock(hashtext('refresh_editais_resumo_pncp')) THEN
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM editais_resumo_pncp_refresh
+               WHERE ultima > now() - interval '60 seconds') THEN
+        RETURN;
+    END IF;
+
+    INSERT INTO editais_resumo_pncp_refresh (id, ultima) VALUES (true, now())
+    ON CONFLICT (id) DO UPDATE SET ultima = EXCLUDED.ultima;
+
+    REFRESH MATERIALIZED VIEW CONCURRENTLY editais_resumo_pncp;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION refresh_editais_resumo_pncp() FROM PUBLIC;
+GRANT EXECUTE ON FUNCTION refresh_editais_resumo_pncp() TO anon, authenticated, service_role;
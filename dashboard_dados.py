@@ -0,0 +1,444 @@
+"""
+DASHBOARD DADOS - Transformações do DASHBOARD.py sem Streamlit
+==============================================================
+processar_dados monta, a partir das tabelas editais_pncp e itens_pncp, o
+DataFrame que a interface exibe (status, prazo, link, item principal, valores
+formatados). Fica fora do DASHBOARD.py para poder ser importado sem subir o
+Streamlit (BENCH_DASHBOARD.py mede o tempo).
+
+TabelaSincronizada mantém uma tabela do Supabase em memória: a primeira
+leitura é a tabela inteira em faixas Range paralelas
+(radar_supabase.carregar_paginado); as seguintes pedem só as linhas com
+updated_at/created_at posterior à última sincronização e mesclam pela chave.
+A cada RESYNC_TOTAL segundos a leitura volta a ser completa (pega exclusões).
+
+CacheDashboard guarda a saída do processar_dados para todas as sessões do
+Streamlit no processo e a renova numa thread própria a cada INTERVALO segundos
+(stale-while-revalidate): quem abre ou interage com o dashboard lê o último
+resultado pronto, sem esperar o Supabase.
+
+processar_dados usa só operações por coluna:
+- Datas: pd.to_datetime(utc=True) + tz_convert para as que têm fuso; as sem
+  fuso são lidas como horário local, como antes
+- status/prazo: np.select sobre as horas até o encerramento
+- Valor do item: valor_total ou quantidade × valor_unitario, em aritmética vetorizada
+- Moeda/quantidade: formatação com separadores brasileiros via str.translate
+- Item principal e n_itens por edital vêm prontos da view editais_resumo_pncp
+  (SUPABASE_RESUMO_EDITAIS.sql) quando ela é passada; resumir_itens calcula
+  só o que faltar nela
+"""
+
+import logging
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+import radar_http
+import radar_supabase
+
+log = logging.getLogger("dashboard_dados")
+
+TZ_BR = "America/Sao_Paulo"
+
+PAGINA = int(os.environ.get("DASHBOARD_PAGINA", 1000))                 # linhas por faixa Range
+PARALELAS = int(os.environ.get("DASHBOARD_PARALELAS", 4))              # faixas buscadas ao mesmo tempo
+RESYNC_TOTAL = float(os.environ.get("DASHBOARD_RESYNC_TOTAL", 1800))   # s entre leituras completas
+MARGEM_SYNC = float(os.environ.get("DASHBOARD_MARGEM_SYNC", 120))      # s relidos antes da última marca
+# Colunas da view editais_resumo_pncp (SUPABASE_RESUMO_EDITAIS.sql) → nomes usados aqui
+COLUNAS_RESUMO = {
+    "descricao_principal":   "_descricao_principal",
+    "qtd_principal":         "_qtd_principal",
+    "preco_unit_principal":  "_preco_unit_principal",
+    "valor_total_principal": "_valor_total_principal",
+    "valor_item_principal":  "_valor_item",
+    "n_itens":               "n_itens",
+    "valor_itens_total":     "valor_itens_total",
+}
+INTERVALO = float(os.environ.get("DASHBOARD_INTERVALO", 120))         # s entre atualizações do cache
+# Coluna de "última alteração", na ordem de preferência; a primeira que a
+# tabela tiver guia a sincronização incremental
+COLUNAS_SYNC = ("updated_at", "created_at")
+
+# Sufixo de fuso no texto ISO: Z, +00:00, -0300...
+_RE_FUSO = r"(?:Z|[+-]\d{2}:?\d{2})$"
+# "1,234.56" (formato en) → "1.234,56"
+_BR = str.maketrans({",": ".", ".": ","})
+
+
+# ================= CARGA DO SUPABASE =================
+
+class TabelaSincronizada:
+    """
+    Cópia em memória de uma tabela do PostgREST, atualizada de forma incremental.
+
+    - `chave`: coluna(s) que identificam a linha; na mescla a versão nova vence
+    - `ordem`: `order` do PostgREST com desempate único (para as faixas Range)
+    - `colunas`: select do PostgREST; com uma lista, a chave e a coluna de
+      sincronização (descoberta numa consulta de uma linha) entram sozinhas
+    - `filtros`: parâmetros extras do PostgREST, aplicados em toda leitura
+    - Sem nenhuma das COLUNAS_SYNC na tabela, toda atualização é completa
+    - Uma instância por processo, segura para várias sessões do Streamlit
+    """
+
+    def __init__(self, endpoint, headers, chave, ordem, colunas="*", filtros=None):
+        self.endpoint = endpoint
+        self.headers = headers
+        self.chave = [chave] if isinstance(chave, str) else list(chave)
+        self.ordem = ordem
+        self.colunas = colunas
+        self.filtros = dict(filtros or {})
+
+        self.df = None
+        self.coluna_sync = None
+        self.marca = None            # maior valor de coluna_sync já visto (pd.Timestamp UTC)
+        self.ultima_total = 0.0
+        self.ultima_sync = 0.0
+        self._sondada = False
+        self._lock = threading.Lock()
+
+    def _sondar_coluna_sync(self):
+        """Descobre, por uma linha com select=*, qual das COLUNAS_SYNC a tabela tem."""
+        try:
+            r = radar_http.get(self.endpoint, headers=self.headers,
+                               params={"select": "*", "limit": 1}, timeout=15)
+            if r.status_code == 200 and r.json():
+                self.coluna_sync = next((c for c in COLUNAS_SYNC if c in r.json()[0]), None)
+                self._sondada = True
+        except Exception as e:
+            log.warning(f"Sondagem de {self.endpoint} falhou: {e}")
+
+    def _select(self):
+        if self.colunas == "*":
+            return "*"
+        if self.coluna_sync is None and not self._sondada:
+            self._sondar_coluna_sync()
+        colunas = self.colunas.split(",")
+        for extra in [*self.chave, self.coluna_sync]:
+            if extra and extra not in colunas:
+                colunas.append(extra)
+        return ",".join(colunas)
+
+    def _ler(self, filtros_extra=None):
+        params = {"select": self._select(), "order": self.ordem, **self.filtros, **(filtros_extra or {})}
+        linhas = radar_supabase.carregar_paginado(
+            self.endpoint, self.headers, params, pagina=PAGINA, paralelas=PARALELAS
+        )
+        if linhas is None:
+            raise RuntimeError(f"leitura de {self.endpoint.rsplit('/', 1)[-1]} falhou")
+        return pd.DataFrame(linhas)
+
+    def atualizar(self, completa=False):
+        """
+        Sincroniza e retorna uma cópia do DataFrame. Levanta RuntimeError se a
+        leitura falhar (o último DataFrame bom continua em `self.df`).
+        """
+        with self._lock:
+            agora = time.time()
+            completa = (completa or self.df is None or self.marca is None
+                        or agora - self.ultima_total >= RESYNC_TOTAL)
+            if completa:
+                df = self._ler()
+                if not df.empty:
+                    # Faixas paralelas se deslocam com inserções no meio da leitura:
+                    # a mesma linha pode vir no fim de uma faixa e no início da seguinte
+                    df = df.drop_duplicates(subset=self.chave, keep="last").reset_index(drop=True)
+                self.ultima_total = agora
+                log.info(f"📥 {self.endpoint.rsplit('/', 1)[-1]}: {len(df)} linha(s), leitura completa")
+            else:
+                desde = (self.marca - pd.Timedelta(seconds=MARGEM_SYNC)).isoformat()
+                novos = self._ler({self.coluna_sync: f"gte.{desde}"})
+                df = self.df
+                if not novos.empty:
+                    df = (pd.concat([df, novos], ignore_index=True)
+                          .drop_duplicates(subset=self.chave, keep="last")
+                          .reset_index(drop=True))
+                log.info(f"📥 {self.endpoint.rsplit('/', 1)[-1]}: {len(novos)} linha(s) desde "
+                         f"{desde}, {len(df)} no total")
+
+            self.coluna_sync = next((c for c in COLUNAS_SYNC if c in df.columns), None)
+            if self.coluna_sync:
+                marca = pd.to_datetime(df[self.coluna_sync], utc=True, errors="coerce",
+                                       format="ISO8601").max()
+                self.marca = None if pd.isna(marca) else marca
+            else:
+                self.marca = None
+            self.df = df
+            self.ultima_sync = agora
+            return df.copy()
+
+
+# ================= TRANSFORMAÇÕES =================
+
+def parse_dt(col):
+    """
+    Converte uma coluna de datas do Supabase para datetime sem fuso. Valores
+    com fuso vão para o horário de Brasília; sem fuso ficam como estão;
+    inválidos viram NaT.
+    """
+    texto = col.where(col.notna(), "").astype(str).str.strip()
+    com_fuso = texto.str.contains(_RE_FUSO, regex=True)
+    resultado = pd.Series(pd.NaT, index=col.index, dtype="datetime64[ns]")
+
+    if com_fuso.any():
+        dt = pd.to_datetime(texto[com_fuso], utc=True, errors="coerce", format="ISO8601")
+        resultado[com_fuso] = dt.dt.tz_convert(TZ_BR).dt.tz_localize(None).astype("datetime64[ns]")
+    sem_fuso = ~com_fuso & (texto != "")
+    if sem_fuso.any():
+        dt = pd.to_datetime(texto[sem_fuso], errors="coerce", format="ISO8601")
+        resultado[sem_fuso] = dt.astype("datetime64[ns]")
+    return resultado
+
+
+def formatar_moeda(valores, positivo=False):
+    """'R$ 1.234,56' por elemento; '—' para vazio/não numérico (e ≤ 0 se `positivo`)."""
+    v = pd.to_numeric(valores, errors="coerce")
+    ok = v.notna() & (v > 0 if positivo else True)
+    texto = pd.Series("—", index=valores.index, dtype=object)
+    if ok.any():
+        texto[ok] = "R$ " + v[ok].map("{:,.2f}".format).str.translate(_BR)
+    return texto
+
+
+def formatar_qtd(valores):
+    """'12.345' (inteiro, separador de milhar) para quantidades > 0; '—' nas demais."""
+    v = pd.to_numeric(valores, errors="coerce")
+    ok = v.notna() & (v > 0)
+    texto = pd.Series("—", index=valores.index, dtype=object)
+    if ok.any():
+        texto[ok] = np.trunc(v[ok]).astype("int64").map("{:,}".format).str.replace(",", ".", regex=False)
+    return texto
+
+
+def montar_links(url_ids):
+    """url_id (/compras/{cnpj}/{ano}/{seq}) → link da página do edital no PNCP."""
+    url_ids = url_ids.where(url_ids.notna(), "").astype(str)
+    partes = url_ids.str.extract(r"^/*compras/([^/]*)/([^/]*)/([^/]+)")
+    links = "https://pncp.gov.br/app/editais" + url_ids
+    casou = partes[0].notna()
+    links[casou] = ("https://pncp.gov.br/app/editais/" + partes[0][casou] + "/"
+                    + partes[1][casou] + "/" + partes[2][casou])
+    links[url_ids == ""] = ""
+    return links
+
+
+def valor_item(df_itens):
+    """
+    valor_total quando > 0, senão valor_unitario × quantidade. Coluna ausente
+    conta como 0; valor nulo no unitário/quantidade deixa o item sem valor (NaN,
+    vai para o fim na escolha do item principal).
+    """
+    def numero(coluna):
+        if coluna not in df_itens.columns:
+            return pd.Series(0.0, index=df_itens.index)
+        return pd.to_numeric(df_itens[coluna], errors="coerce")
+
+    total = numero("valor_total")
+    return total.where(total > 0, numero("valor_unitario") * numero("quantidade"))
+
+
+def resumir_itens(df_itens):
+    """
+    Por edital: item principal (o de maior valor), n_itens e valor somado dos
+    itens — o mesmo que a view editais_resumo_pncp calcula no banco.
+    """
+    itens = df_itens.copy()
+    itens["_valor_item"] = valor_item(itens)
+
+    # sort + drop_duplicates é mais seguro que idxmax+loc (sem dependência de índice)
+    principal = (
+        itens
+        .sort_values("_valor_item", ascending=False)
+        .drop_duplicates(subset="edital_url_id", keep="first")
+        .rename(columns={
+            "edital_url_id":  "url_id",
+            "descricao":      "_descricao_principal",
+            "quantidade":     "_qtd_principal",
+            "valor_unitario": "_preco_unit_principal",
+            "valor_total":    "_valor_total_principal",
+        })
+    )
+    agregados = (
+        itens.groupby("edital_url_id")["_valor_item"]
+        .agg(n_itens="size", valor_itens_total="sum")
+        .rename_axis("url_id")
+        .reset_index()
+    )
+    colunas = ["url_id", *[c for c in COLUNAS_RESUMO.values() if c in principal.columns]]
+    return principal[colunas].merge(agregados, on="url_id", how="left")
+
+
+def processar_dados(df_editais, df_itens, df_resumo=None, hoje=None):
+    """`hoje` (datetime sem fuso) fixa o relógio de status/prazo; padrão: agora."""
+    if df_editais.empty:
+        return pd.DataFrame()
+
+    hoje = hoje or datetime.now()  # naive, sem timezone (compatível com datas convertidas)
+
+    df_editais["dt_fim"] = parse_dt(df_editais["data_fim"])
+    df_editais["dt_inicio"] = parse_dt(df_editais["data_inicio"])
+    df_editais["dt_pub"] = parse_dt(df_editais["data_publicacao"])
+
+    # Horas até o encerramento → status e texto do prazo
+    diff_h = ((df_editais["dt_fim"] - pd.Timestamp(hoje)) / pd.Timedelta(hours=1)).to_numpy()
+    sem_data = np.isnan(diff_h)
+    encerrado = ~sem_data & (diff_h < 0)
+    horas = np.nan_to_num(diff_h)
+
+    df_editais["status"] = np.select(
+        [sem_data, encerrado, horas <= 72],
+        ["⚪ Sem data", "🔴 Encerrado", "⚠️ Urgente"],
+        default="✅ Aberto",
+    )
+    dias = (np.abs(horas) // 24).astype("int64").astype(str)
+    df_editais["prazo"] = np.select(
+        [sem_data, encerrado, horas < 24],
+        [
+            "—",
+            np.char.add(np.char.add("Encerrou há ", dias), "d"),
+            np.char.add(np.char.add("⚠️ ", np.trunc(horas).astype("int64").astype(str)), "h restantes"),
+        ],
+        default=np.char.add(dias, " dias"),
+    )
+
+    df_editais["link_pncp"] = montar_links(df_editais["url_id"])
+
+    df_editais["Abertura"] = df_editais["dt_inicio"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
+    df_editais["Encerramento"] = df_editais["dt_fim"].dt.strftime("%d/%m/%Y %H:%M").fillna("—")
+    df_editais["Publicação"] = df_editais["dt_pub"].dt.strftime("%d/%m/%Y").fillna("—")
+
+    # Agregados por edital (item principal, n_itens): da view editais_resumo_pncp
+    # quando o dashboard a leu; editais que ainda não estão nela (view não
+    # atualizada desde a gravação) ou sem view nenhuma são resumidos aqui
+    partes = []
+    if df_resumo is not None and not df_resumo.empty:
+        partes.append(df_resumo.rename(columns=COLUNAS_RESUMO)[["url_id", *COLUNAS_RESUMO.values()]])
+    if not df_itens.empty and "edital_url_id" in df_itens.columns:
+        pendentes = df_itens
+        if partes:
+            pendentes = df_itens[~df_itens["edital_url_id"].isin(partes[0]["url_id"])]
+        if not pendentes.empty:
+            partes.append(resumir_itens(pendentes))
+
+    if partes:
+        df = df_editais.merge(pd.concat(partes, ignore_index=True), on="url_id", how="left")
+
+        df["qtd_total"]      = df["_qtd_principal"]
+        df["preco_unit_max"] = df["_preco_unit_principal"]
+        df["preco_unit_min"] = df["_preco_unit_principal"]
+    else:
+        df = df_editais.copy()
+        df["_descricao_principal"]  = ""
+        df["_qtd_principal"]        = None
+        df["_preco_unit_principal"] = None
+        df["_valor_total_principal"]= None
+        df["_valor_item"]           = 0.0
+        df["qtd_total"]             = 0
+        df["n_itens"]               = 0
+        df["valor_itens_total"]     = 0.0
+        df["preco_unit_max"]        = None
+        df["preco_unit_min"]        = None
+
+    # Produto: descrição do item principal; sem ela, o objeto (ou o título) do edital
+    descricao = df["_descricao_principal"].where(df["_descricao_principal"].notna(), "").astype(str)
+    reserva = df["objeto"] if "objeto" in df.columns else df.get("titulo", pd.Series("—", index=df.index))
+    reserva = reserva.where(reserva.notna() & (reserva.astype(str) != ""), "—").astype(str)
+    df["produto"] = descricao.where(descricao.str.len() > 5, reserva).str[:120]
+
+    df["preco_unit_fmt"] = formatar_moeda(df["preco_unit_max"])
+    df["qtd_fmt"] = formatar_qtd(df["qtd_total"])
+
+    # Valor total formatado — usa valor do item principal (coerente com qtd/preço exibidos)
+    # Fallback para valor_total_estimado do edital se item não tiver valor
+    df["_valor_exib"] = df["_valor_total_principal"].fillna(df["_valor_item"])
+    # Se item não tem valor, cai para valor_total_estimado do edital
+    df["_valor_exib"] = df["_valor_exib"].where(
+        df["_valor_exib"].fillna(0) > 0, df["valor_total_estimado"]
+    )
+    df["valor_total_fmt"] = formatar_moeda(df["_valor_exib"], positivo=True)
+
+    return df
+
+
+# ================= CACHE DO PROCESSO =================
+
+class CacheDashboard:
+    """
+    Resultado do processar_dados compartilhado por todas as sessões do processo.
+
+    - Uma thread sincroniza as tabelas (em paralelo) e roda processar_dados a
+      cada `intervalo` segundos, ou logo depois de solicitar_atualizacao()
+    - O resultado novo substitui `retrato` de uma vez (troca de referência):
+      quem lê nunca vê estado parcial nem espera rede — só a primeira carga do
+      processo bloqueia
+    - Tabela que falha fica na última versão boa; o erro vai para retrato["erros"]
+      (a view de resumo é opcional: sem ela processar_dados resume os itens)
+    - Os DataFrames do retrato são compartilhados: quem for alterar, copia antes
+    """
+
+    def __init__(self, editais, itens, resumo=None, intervalo=INTERVALO):
+        self.tabelas = {"editais": editais, "itens": itens, "resumo": resumo}
+        self.intervalo = intervalo
+        self.retrato = None  # {"df", "itens", "atualizado_em", "duracao", "erros"}
+        self.atualizando = False
+        self._pronto = threading.Event()
+        self._pedido = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name="dashboard-cache", daemon=True)
+        self._thread.start()
+
+    def _sincronizar(self, nome, erros):
+        tabela = self.tabelas[nome]
+        if tabela is None:
+            return pd.DataFrame()
+        try:
+            return tabela.atualizar()
+        except Exception as e:
+            log.warning(f"Sincronização de {nome} falhou: {e}")
+            if nome != "resumo":
+                erros.append(f"{nome}: {e}")
+            return tabela.df.copy() if tabela.df is not None else pd.DataFrame()
+
+    def atualizar(self):
+        """Sincroniza, processa e publica um retrato novo (roda na thread do cache)."""
+        inicio = time.monotonic()
+        erros = []
+        with ThreadPoolExecutor(max_workers=len(self.tabelas)) as pool:
+            editais, itens, resumo = pool.map(lambda nome: self._sincronizar(nome, erros),
+                                              ["editais", "itens", "resumo"])
+        df = processar_dados(editais, itens, resumo)
+        self.retrato = {
+            "df": df,
+            "itens": itens,
+            "atualizado_em": datetime.now(),
+            "duracao": time.monotonic() - inicio,
+            "erros": erros,
+        }
+        log.info(f"🔄 Cache do dashboard: {len(df)} edital(is), {len(itens)} item(ns) "
+                 f"em {self.retrato['duracao']:.1f}s")
+
+    def _laco(self):
+        while True:
+            self.atualizando = True
+            try:
+                self.atualizar()
+            except Exception as e:
+                log.error(f"Atualização do cache do dashboard falhou: {e}")
+            finally:
+                self.atualizando = False
+                self._pronto.set()
+            self._pedido.wait(timeout=self.intervalo)
+            self._pedido.clear()
+
+    def solicitar_atualizacao(self):
+        """Antecipa a próxima atualização (não apaga o retrato atual)."""
+        self._pedido.set()
+
+    def obter(self, timeout=None):
+        """Retrato atual; só espera se a primeira carga do processo ainda não terminou."""
+        self._pronto.wait(timeout)
+        return self.retrato
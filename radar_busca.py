@@ -0,0 +1,311 @@
+"""
+RADAR BUSCA - API de busca textual do PNCP (/api/search/)
+=========================================================
+Os radares (LICITACAO.PY, LICITACAO_2.py, LICITACAO_ALTOCUSTO.py,
+BACKFILL_ALTOCUSTO.py) buscam os editais do dia por keyword na API search,
+ordenada por data de divulgação. O código era o mesmo copiado em cada script;
+aqui fica uma versão só.
+
+- buscar_search_api: uma página de uma keyword, filtrada para o dia alvo
+- buscar_termos: várias keywords em paralelo; a página N+1 de uma keyword só é
+  pedida quando a página N voltou cheia e o item mais antigo dela ainda é do
+  dia alvo ou mais novo (a busca é ordenada por -data). Retorna os resultados
+  por termo
+- percorrer_termo: a sequência de um termo numa janela de vários dias, página
+  a página (backfill), retomável a partir de uma página; diz se terminou por
+  chegar ao início da janela (FIM_DATA) ou por bater o teto de páginas (FIM_TETO)
+- Páginas de BUSCA_TAM_PAGINA=100 itens (antes 20) e até BUSCA_MAX_PAGINAS=10;
+  resumo() compara as requisições feitas com a paginação antiga
+- mesclar: junta os resultados por termo num dict url_id -> item, na ordem
+  (termo, página) — o mesmo resultado da busca sequencial antiga
+- enriquecer_contratacao: datas e itens de uma contratação da listagem, com as
+  funções de busca de cada radar (keywords e tabelas mudam por script);
+  enriquecer_contratacoes faz isso em paralelo para as que passam na triagem
+  do radar
+- O ritmo das chamadas é controlado pelo token bucket do radar_http;
+  BUSCA_MAX_WORKERS=1 volta ao caminho sequencial
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+import radar_http
+import radar_supabase
+
+log = logging.getLogger("radar_busca")
+
+URL_SEARCH = "https://pncp.gov.br/api/search/"
+PNCP_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept": "application/json",
+}
+
+# Paginação por data: a busca vem ordenada da divulgação mais nova para a mais
+# antiga, então basta avançar enquanto a página vem cheia e o item mais antigo
+# dela ainda não é anterior à janela. Páginas maiores = menos requisições.
+TAM_PAGINA = int(os.environ.get("BUSCA_TAM_PAGINA", "100"))
+MAX_PAGINAS = int(os.environ.get("BUSCA_MAX_PAGINAS", "10"))
+MAX_WORKERS = int(os.environ.get("BUSCA_MAX_WORKERS", "8"))
+
+# Enriquecimento (datas + itens de cada contratação do dia) em paralelo;
+# o ritmo das chamadas ao PNCP é controlado pelo radar_http
+ENRIQUECIMENTO_MAX_WORKERS = int(os.environ.get("ENRIQUECIMENTO_MAX_WORKERS", "8"))
+
+# Como percorrer_termo terminou uma sequência: chegou a data_ini, ou parou no
+# teto de páginas antes disso (a unidade do backfill não está completa)
+FIM_DATA = "data_ini"
+FIM_TETO = "teto"
+
+# Regra antiga (páginas de 20, avança enquanto a página tem 20 itens do dia,
+# até 10 páginas) — só para estimar quantas requisições a nova regra economiza
+TAM_PAGINA_ANTIGO = 20
+MAX_PAGINAS_ANTIGO = 10
+
+estatisticas = {"requisicoes": 0, "requisicoes_regra_antiga": 0}
+_lock = threading.Lock()
+
+
+def buscar_pagina(keyword, pagina=1, tam_pagina=TAM_PAGINA):
+    """Uma página crua da busca textual (mais nova → mais antiga). None se a requisição falhar."""
+    params = {
+        "q": keyword,
+        "tipos_documento": "edital",
+        "ordenacao": "-data",
+        "pagina": pagina,
+        "tam_pagina": tam_pagina,
+    }
+    with _lock:
+        estatisticas["requisicoes"] += 1
+    try:
+        r = radar_http.get(URL_SEARCH, params=params, headers=PNCP_HEADERS, timeout=30)
+        if r.status_code == 200:
+            return r.json().get("items", [])
+        log.warning(f"Search keyword='{keyword}' pag={pagina} retornou {r.status_code}")
+        return None
+    except requests.exceptions.Timeout:
+        log.warning(f"Timeout search keyword='{keyword}' pag={pagina}")
+        return None
+    except Exception as e:
+        log.error(f"Erro search API: {e}")
+        return None
+
+
+def data_publicacao(item):
+    """AAAA-MM-DD da divulgação no PNCP ("" se ausente)."""
+    return (item.get("data_publicacao_pncp") or "")[:10]
+
+
+def buscar_search_api(keyword, data_fmt, pagina=1, tam_pagina=TAM_PAGINA):
+    """Uma página da busca textual, só com os editais divulgados em `data_fmt` (AAAA-MM-DD)."""
+    return [i for i in buscar_pagina(keyword, pagina, tam_pagina) or [] if data_publicacao(i) == data_fmt]
+
+
+def sequencia_continua(items, data_ini, tam_pagina=TAM_PAGINA):
+    """
+    A sequência continua depois desta página? Só se ela veio cheia e o item mais
+    antigo dela ainda não é anterior a `data_ini` (resultados ordenados por -data).
+    """
+    if not items or len(items) < tam_pagina:
+        return False
+    datas = [d for d in map(data_publicacao, items) if d]
+    return not datas or min(datas) >= data_ini
+
+
+def tem_proxima_pagina(items, data_ini, pagina, tam_pagina=TAM_PAGINA, max_paginas=None):
+    """Vale pedir a página seguinte? A sequência continua e `pagina` ainda não é a última permitida."""
+    return pagina < (max_paginas or MAX_PAGINAS) and sequencia_continua(items, data_ini, tam_pagina)
+
+
+def requisicoes_regra_antiga(items, data_fmt):
+    """Quantas páginas de 20 a regra antiga teria pedido para a sequência `items` de um termo."""
+    n = 0
+    for inicio in range(0, TAM_PAGINA_ANTIGO * MAX_PAGINAS_ANTIGO, TAM_PAGINA_ANTIGO):
+        n += 1
+        pagina = items[inicio:inicio + TAM_PAGINA_ANTIGO]
+        if sum(1 for i in pagina if data_publicacao(i) == data_fmt) < TAM_PAGINA_ANTIGO:
+            break
+    return n
+
+
+def url_id_search(item):
+    cnpj = item.get("orgao_cnpj", "")
+    ano = item.get("ano", "")
+    seq = item.get("numero_sequencial", "")
+    if not cnpj or not ano or not seq:
+        return None
+    return f"/compras/{cnpj}/{ano}/{seq}"
+
+
+def normalizar_item_search(item):
+    """Converte item da API search para o formato usado por processar_contratacao."""
+    return {
+        "objetoCompra": item.get("description", item.get("title", "")),
+        "orgaoEntidade": {
+            "cnpj": item.get("orgao_cnpj", ""),
+            "razaoSocial": item.get("orgao_nome", ""),
+        },
+        "unidadeOrgao": {
+            "ufSigla": item.get("uf", ""),
+            "municipioNome": item.get("municipio_nome", ""),
+        },
+        "anoCompra": item.get("ano", ""),
+        "sequencialCompra": item.get("numero_sequencial", ""),
+        "modalidadeNome": item.get("modalidade_licitacao_nome", ""),
+        "dataPublicacaoPncp": item.get("data_publicacao_pncp"),
+        "dataAberturaProposta": item.get("data_inicio_vigencia"),
+        "dataEncerramentoProposta": item.get("data_fim_vigencia"),
+        "valorTotalEstimado": item.get("valor_total_estimado"),
+        "numeroCompra": item.get("numero_sequencial", ""),
+        "numeroControlePNCP": item.get("item_url", ""),
+        "linkSistemaOrigem": "",
+        "_source": "search",
+    }
+
+
+def buscar_termos(termos, data_fmt, max_workers=None):
+    """
+    Busca cada termo no dia `data_fmt` e retorna {termo: {url_id: item
+    normalizado}}, cada dict na ordem das páginas. Termos repetidos são buscados uma vez.
+    """
+    termos = list(dict.fromkeys(termos))
+    max_workers = max_workers or MAX_WORKERS
+    paginas = {}  # (termo, página) -> itens crus
+
+    def tarefa(termo, pagina):
+        return termo, pagina, buscar_pagina(termo, pagina=pagina)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pendentes = {pool.submit(tarefa, termo, 1) for termo in termos}
+        while pendentes:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            for fut in prontos:
+                termo, pagina, items = fut.result()
+                paginas[(termo, pagina)] = items or []
+                if tem_proxima_pagina(items, data_fmt, pagina):
+                    pendentes.add(pool.submit(tarefa, termo, pagina + 1))
+
+    resultados = {termo: {} for termo in termos}
+    sequencias = {termo: [] for termo in termos}
+    for termo, pagina in sorted(paginas, key=lambda chave: chave[1]):
+        sequencias[termo].extend(paginas[(termo, pagina)])
+        por_termo = resultados[termo]
+        for item in paginas[(termo, pagina)]:
+            if data_publicacao(item) != data_fmt:
+                continue
+            url_id = url_id_search(item)
+            if url_id and url_id not in por_termo:
+                por_termo[url_id] = normalizar_item_search(item)
+
+    antigas = sum(requisicoes_regra_antiga(seq, data_fmt) for seq in sequencias.values())
+    with _lock:
+        estatisticas["requisicoes_regra_antiga"] += antigas
+    log.info(f"   📡 {len(paginas)} requisições à API search ({len(termos)} termos, "
+             f"{TAM_PAGINA}/página, {max_workers} workers) — regra antiga: ~{antigas}")
+    return resultados
+
+
+def percorrer_termo(termo, data_ini, data_fim, pagina=1, max_paginas=None):
+    """
+    Segue a sequência -data de `termo` a partir de `pagina` até o primeiro item
+    anterior a `data_ini` (datas AAAA-MM-DD). Gera (pagina, hits, fim): hits são
+    (data, url_id, item normalizado) divulgados em [data_ini, data_fim]; fim é
+    None no meio da sequência, FIM_DATA quando ela chegou a `data_ini` e
+    FIM_TETO quando parou na página `max_paginas` sem chegar lá. Se uma
+    requisição falha, para sem fim — quem retoma do cursor pede a mesma página de novo.
+
+    Itens novos divulgados durante a varredura entram no topo e empurram os
+    antigos para páginas seguintes: retomar numa página salva pode repetir
+    itens, mas não pula nenhum.
+    """
+    teto = max_paginas or MAX_PAGINAS
+    while True:
+        items = buscar_pagina(termo, pagina=pagina)
+        if items is None:
+            return
+        hits = []
+        for item in items:
+            data = data_publicacao(item)
+            url_id = url_id_search(item)
+            if url_id and data_ini <= data <= data_fim:
+                hits.append((data, url_id, normalizar_item_search(item)))
+        if not sequencia_continua(items, data_ini):
+            yield pagina, hits, FIM_DATA
+            return
+        if pagina >= teto:
+            yield pagina, hits, FIM_TETO
+            return
+        yield pagina, hits, None
+        pagina += 1
+
+
+def mesclar(resultados, termos):
+    """Une os resultados de `termos` (na ordem dada) em {url_id: item}, mantendo a primeira ocorrência."""
+    todos = {}
+    for termo in termos:
+        for url_id, item in resultados.get(termo, {}).items():
+            todos.setdefault(url_id, item)
+    return todos
+
+
+def buscar_por_termos(termos, data_fmt, max_workers=None):
+    """Atalho dos radares: busca `termos` no dia e devolve {url_id: item} já mesclado."""
+    return mesclar(buscar_termos(termos, data_fmt, max_workers), termos)
+
+
+def enriquecer_contratacao(item, buscar_datas, buscar_itens):
+    """
+    Busca no PNCP o que a listagem não traz: datas da compra (só se faltarem)
+    e itens relevantes. `buscar_datas` e `buscar_itens` são as funções
+    (cnpj, ano, seq) do radar. Retorna {"datas": (inicio, fim), "itens": (texto, banco, valor)}.
+    """
+    cnpj = item.get("orgaoEntidade", {}).get("cnpj", "")
+    ano = item.get("anoCompra")
+    seq = item.get("sequencialCompra")
+
+    datas = (None, None)
+    if not item.get("dataAberturaProposta") or not item.get("dataEncerramentoProposta"):
+        log.info(f"   🔍 Buscando datas individuais para {cnpj}/{ano}/{seq}...")
+        datas = buscar_datas(cnpj, ano, seq)
+
+    return {"datas": datas, "itens": buscar_itens(cnpj, ano, seq)}
+
+
+def enriquecer_contratacoes(contratacoes, keyword_match, objeto_bloqueado, buscar_datas, buscar_itens,
+                            max_workers=None):
+    """
+    Enriquece em paralelo as contratações do dia que passam pela triagem de
+    processar_contratacao (keyword/bloqueio/identificação, com as funções
+    `keyword_match` e `objeto_bloqueado` do radar). O ritmo das chamadas ao PNCP
+    fica com o limitador por host do radar_http. Retorna lista alinhada com
+    `contratacoes` (None = descartada na triagem; processar_contratacao decide e loga).
+    """
+    max_workers = max_workers or ENRIQUECIMENTO_MAX_WORKERS
+
+    def tarefa(item):
+        objeto = item.get("objetoCompra", "")
+        if item.get("_source") != "search" and not keyword_match(objeto):
+            return None
+        if objeto_bloqueado(objeto) or not radar_supabase.url_id_da_contratacao(item):
+            return None
+        return enriquecer_contratacao(item, buscar_datas, buscar_itens)
+
+    inicio = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        enriquecidos = list(pool.map(tarefa, contratacoes))
+    n = sum(1 for e in enriquecidos if e is not None)
+    log.info(f"   ⚡ Enriquecimento: {n}/{len(contratacoes)} contratações em "
+             f"{time.monotonic() - inicio:.1f}s ({max_workers} workers)")
+    return enriquecidos
+
+
+def resumo():
+    """Requisições feitas x estimativa da paginação antiga (páginas de 20 itens do dia)."""
+    feitas = estatisticas["requisicoes"]
+    antigas = estatisticas["requisicoes_regra_antiga"]
+    return (f"{feitas} requisição(ões) à API search, ~{antigas} na paginação antiga "
+            f"({antigas - feitas:+d} economizadas)" if antigas else f"{feitas} requisição(ões) à API search")
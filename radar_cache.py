@@ -0,0 +1,319 @@
+"""
+RADAR CACHE - Cache em disco das respostas do PNCP (compra e itens)
+===================================================================
+Os radares rodam 6x por dia sobre o mesmo dia e o backfill varre meses
+inteiros: as mesmas URLs de /compras/{cnpj}/{ano}/{seq} e .../itens eram
+buscadas de novo a cada execução. Aqui elas ficam num SQLite local.
+
+- Chave = método + URL + params (ordenados); corpo gravado comprimido (zlib)
+- TTL por tipo de endpoint ("compra", "itens"), ajustável por ambiente:
+    RADAR_CACHE_TTL_COMPRA=21600   RADAR_CACHE_TTL_ITENS=43200   (segundos)
+- Expirou e a resposta tinha ETag/Last-Modified: revalida com
+  If-None-Match/If-Modified-Since; 304 renova a entrada sem baixar de novo
+- Tamanho máximo (RADAR_CACHE_MAX_MB=200): acima disso remove as entradas
+  acessadas há mais tempo (LRU)
+- Diretório em RADAR_CACHE_DIR (padrão .cache/radar_http), persistido entre
+  execuções e compartilhado entre os radares via actions/cache nos workflows.
+  RADAR_CACHE_DIR="" desliga o cache
+- Só respostas 200 são gravadas; qualquer erro do cache cai na chamada direta
+- Cache negativo dos itens: 204/404 em .../compras/{ano}/{seq}/itens fica
+  lembrado por cnpj/ano/seq. O TTL começa em RADAR_CACHE_TTL_VAZIO=21600 e
+  dobra a cada nova confirmação de que continua vazio, até
+  RADAR_CACHE_TTL_VAZIO_MAX=604800; um 200 apaga a entrada
+- registrar_itens/estatisticas_itens: contagem persistente, por modalidade,
+  de chamadas de itens, respostas vazias e itens que bateram na keyword. A
+  cada chamada nova as contagens antigas são multiplicadas por
+  RADAR_CACHE_DECAIMENTO_ITENS=0.998 (janela efetiva de ~500 chamadas), para
+  a estatística acompanhar mudanças de comportamento do PNCP
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+import radar_http
+
+log = logging.getLogger("radar_cache")
+
+CACHE_DIR = os.environ.get("RADAR_CACHE_DIR", ".cache/radar_http")
+MAX_BYTES = int(float(os.environ.get("RADAR_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+TTL_POR_TIPO = {
+    "compra": int(os.environ.get("RADAR_CACHE_TTL_COMPRA", 6 * 3600)),
+    "itens": int(os.environ.get("RADAR_CACHE_TTL_ITENS", 12 * 3600)),
+}
+
+# Cache negativo: tipos cobertos, status que contam como "vazio" e TTL crescente
+TIPOS_VAZIO = ("itens",)
+STATUS_VAZIO = (204, 404)
+TTL_VAZIO = int(os.environ.get("RADAR_CACHE_TTL_VAZIO", 6 * 3600))
+TTL_VAZIO_MAX = int(os.environ.get("RADAR_CACHE_TTL_VAZIO_MAX", 7 * 86400))
+DECAIMENTO_ITENS = float(os.environ.get("RADAR_CACHE_DECAIMENTO_ITENS", "0.998"))
+_RE_COMPRA = re.compile(r"/orgaos/([^/]+)/compras/(\d+)/(\d+)/")
+
+_conexao = None
+_lock = threading.Lock()
+_gravacoes_desde_limpeza = 0
+
+estatisticas = {"hit": 0, "vazio": 0, "revalidado": 0, "miss": 0, "erro": 0}
+
+
+def _contar(evento):
+    with _lock:
+        estatisticas[evento] += 1
+
+
+class RespostaCache:
+    """O pedaço de requests.Response que os scripts usam: status_code, headers, content, text, json()."""
+
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def _abrir():
+    global _conexao
+    if _conexao is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        _conexao = sqlite3.connect(os.path.join(CACHE_DIR, "pncp.sqlite3"),
+                                   check_same_thread=False, timeout=30)
+        _conexao.execute("PRAGMA journal_mode=WAL")
+        _conexao.execute("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                corpo BLOB NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                gravado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL,
+                tamanho INTEGER NOT NULL
+            )
+        """)
+        _conexao.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas(acessado_em)")
+        _conexao.execute("""
+            CREATE TABLE IF NOT EXISTS vazios (
+                compra TEXT PRIMARY KEY,
+                status INTEGER NOT NULL,
+                vezes INTEGER NOT NULL,
+                verificado_em REAL NOT NULL,
+                expira_em REAL NOT NULL
+            )
+        """)
+        _conexao.execute("""
+            CREATE TABLE IF NOT EXISTS itens_modalidade (
+                modalidade INTEGER PRIMARY KEY,
+                chamadas REAL NOT NULL DEFAULT 0,
+                vazios REAL NOT NULL DEFAULT 0,
+                acertos REAL NOT NULL DEFAULT 0
+            )
+        """)
+        _conexao.commit()
+    return _conexao
+
+
+def _chave(url, params):
+    if params:
+        url = f"{url}?{urlencode(sorted(params.items()))}"
+    return f"GET {url}"
+
+
+def _ler(chave):
+    with _lock:
+        linha = _abrir().execute(
+            "SELECT corpo, headers, etag, last_modified, gravado_em FROM respostas WHERE chave = ?",
+            (chave,),
+        ).fetchone()
+        if linha:
+            _conexao.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            _conexao.commit()
+    return linha
+
+
+def _gravar(chave, tipo, resp):
+    global _gravacoes_desde_limpeza
+    corpo = zlib.compress(resp.content)
+    headers = {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "etag", "last-modified")}
+    agora = time.time()
+    with _lock:
+        _abrir().execute(
+            "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (chave, tipo, corpo, json.dumps(headers), resp.headers.get("ETag"),
+             resp.headers.get("Last-Modified"), agora, agora, len(corpo)),
+        )
+        _conexao.commit()
+        _gravacoes_desde_limpeza += 1
+        if _gravacoes_desde_limpeza >= 200:
+            _gravacoes_desde_limpeza = 0
+            _limpar()
+
+
+def _renovar(chave):
+    agora = time.time()
+    with _lock:
+        _abrir().execute("UPDATE respostas SET gravado_em = ?, acessado_em = ? WHERE chave = ?",
+                         (agora, agora, chave))
+        _conexao.commit()
+
+
+def _compra(url):
+    """cnpj/ano/seq de uma URL .../orgaos/{cnpj}/compras/{ano}/{seq}/... (None se não casar)."""
+    m = _RE_COMPRA.search(url)
+    return "/".join(m.groups()) if m else None
+
+
+def _ler_vazio(compra):
+    """Status (204/404) ainda válido no cache negativo, ou None."""
+    with _lock:
+        linha = _abrir().execute(
+            "SELECT status FROM vazios WHERE compra = ? AND expira_em > ?", (compra, time.time())
+        ).fetchone()
+    return linha[0] if linha else None
+
+
+def _marcar_vazio(compra, status):
+    """Grava/renova a entrada negativa; cada confirmação seguida dobra o TTL."""
+    agora = time.time()
+    with _lock:
+        linha = _abrir().execute("SELECT vezes FROM vazios WHERE compra = ?", (compra,)).fetchone()
+        vezes = (linha[0] if linha else 0) + 1
+        ttl = min(TTL_VAZIO * 2 ** (vezes - 1), TTL_VAZIO_MAX)
+        _conexao.execute("INSERT OR REPLACE INTO vazios VALUES (?, ?, ?, ?, ?)",
+                         (compra, status, vezes, agora, agora + ttl))
+        _conexao.commit()
+
+
+def _apagar_vazio(compra):
+    with _lock:
+        _abrir().execute("DELETE FROM vazios WHERE compra = ?", (compra,))
+        _conexao.commit()
+
+
+def _limpar():
+    """Remove as entradas menos acessadas até o cache voltar a 90% de MAX_BYTES (chamar com _lock)."""
+    _conexao.execute("DELETE FROM vazios WHERE expira_em < ?", (time.time() - TTL_VAZIO_MAX,))
+    total = _conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    alvo = total - int(MAX_BYTES * 0.9)
+    removidos, liberado = 0, 0
+    for chave, tamanho in _conexao.execute(
+            "SELECT chave, tamanho FROM respostas ORDER BY acessado_em").fetchall():
+        if liberado >= alvo:
+            break
+        _conexao.execute("DELETE FROM respostas WHERE chave = ?", (chave,))
+        liberado += tamanho
+        removidos += 1
+    _conexao.commit()
+    log.info(f"🧹 Cache HTTP: {removidos} entradas removidas ({liberado // 1024} KB)")
+
+
+def get(url, tipo, params=None, headers=None, **kwargs):
+    """
+    GET com cache. `tipo` escolhe o TTL em TTL_POR_TIPO. Retorna um
+    requests.Response (da rede) ou um RespostaCache (do disco).
+    """
+    if not CACHE_DIR:
+        return radar_http.get(url, params=params, headers=headers, **kwargs)
+
+    chave = _chave(url, params)
+    compra = _compra(url) if tipo in TIPOS_VAZIO else None
+    try:
+        if compra:
+            status = _ler_vazio(compra)
+            if status:
+                _contar("vazio")
+                return RespostaCache(status, b"", {})
+        linha = _ler(chave)
+    except Exception as e:
+        _contar("erro")
+        log.warning(f"Cache HTTP indisponível ({e}) — seguindo sem cache")
+        return radar_http.get(url, params=params, headers=headers, **kwargs)
+
+    condicionais = {}
+    if linha:
+        corpo, headers_cache, etag, last_modified, gravado_em = linha
+        if time.time() - gravado_em < TTL_POR_TIPO[tipo]:
+            _contar("hit")
+            return RespostaCache(200, zlib.decompress(corpo), json.loads(headers_cache))
+        if etag:
+            condicionais["If-None-Match"] = etag
+        if last_modified:
+            condicionais["If-Modified-Since"] = last_modified
+
+    resp = radar_http.get(url, params=params, headers={**(headers or {}), **condicionais}, **kwargs)
+
+    try:
+        if resp.status_code == 304 and linha:
+            _contar("revalidado")
+            _renovar(chave)
+            return RespostaCache(200, zlib.decompress(linha[0]), json.loads(linha[1]))
+        _contar("miss")
+        if resp.status_code == 200:
+            _gravar(chave, tipo, resp)
+        if compra and resp.status_code in STATUS_VAZIO:
+            _marcar_vazio(compra, resp.status_code)
+        elif compra and resp.status_code == 200:
+            _apagar_vazio(compra)
+    except Exception as e:
+        _contar("erro")
+        log.warning(f"Erro no cache HTTP ({chave}): {e}")
+    return resp
+
+
+def registrar_itens(modalidade, vazio, acerto):
+    """
+    Soma uma chamada de itens feita na rede à estatística persistente da
+    modalidade, depois de decair as contagens anteriores por DECAIMENTO_ITENS.
+    """
+    if not CACHE_DIR or modalidade is None:
+        return
+    try:
+        with _lock:
+            _abrir().execute(
+                "INSERT INTO itens_modalidade (modalidade, chamadas, vazios, acertos) "
+                "VALUES (:modalidade, 1, :vazio, :acerto) "
+                "ON CONFLICT(modalidade) DO UPDATE SET chamadas = chamadas * :decaimento + 1, "
+                "vazios = vazios * :decaimento + excluded.vazios, "
+                "acertos = acertos * :decaimento + excluded.acertos",
+                {"modalidade": int(modalidade), "vazio": int(vazio), "acerto": int(acerto),
+                 "decaimento": DECAIMENTO_ITENS},
+            )
+            _conexao.commit()
+    except Exception as e:
+        log.warning(f"Erro ao registrar estatística de itens (mod {modalidade}): {e}")
+
+
+def estatisticas_itens():
+    """{modalidade: (chamadas, vazias, com keyword)} com decaimento, entre execuções ({} sem cache)."""
+    if not CACHE_DIR:
+        return {}
+    try:
+        with _lock:
+            linhas = _abrir().execute(
+                "SELECT modalidade, chamadas, vazios, acertos FROM itens_modalidade").fetchall()
+    except Exception as e:
+        log.warning(f"Erro ao ler estatística de itens: {e}")
+        return {}
+    return {modalidade: (chamadas, vazios, acertos) for modalidade, chamadas, vazios, acertos in linhas}
+
+
+def resumo():
+    return (f"{estatisticas['hit']} hit(s), {estatisticas['vazio']} vazio(s) lembrado(s), "
+            f"{estatisticas['revalidado']} revalidado(s) (304), "
+            f"{estatisticas['miss']} miss(es), {estatisticas['erro']} erro(s)")
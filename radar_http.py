@@ -0,0 +1,271 @@
+"""
+RADAR HTTP - Cliente HTTP compartilhado pelos robôs do Radar FarmaUSA
+=====================================================================
+Todos os scripts (LICITACAO.PY, LICITACAO_2.py, LICITACAO_ALTOCUSTO.py,
+BACKFILL_ALTOCUSTO.py, LICITACAO_VARREDURA.PY, PREENCHER_DATAS.py) fazem
+suas chamadas ao PNCP, ao Supabase e ao Telegram por aqui.
+
+- Uma requests.Session keep-alive por host: o handshake TCP+TLS é pago
+  uma vez por host por execução, não a cada chamada
+- Um token bucket por host, compartilhado por todas as threads, no lugar
+  dos time.sleep fixos espalhados pelos scripts. A taxa é adaptativa (AIMD):
+  sobe um pouco a cada resposta saudável, cai pela metade em 429/5xx, e um
+  Retry-After pausa o host inteiro pelo tempo pedido
+- 429 (e 5xx/erro de conexão em métodos idempotentes) são repetidos até
+  `retries` vezes; POST só é repetido em 429, quando o servidor não o processou
+- Pool, timeout, taxa e repetições ajustáveis por grupo de host
+  (pncp, supabase, telegram) via variáveis de ambiente:
+    RADAR_HTTP_POOL_PNCP=16      RADAR_HTTP_TIMEOUT_PNCP=30
+    RADAR_HTTP_TAXA_PNCP=5       RADAR_HTTP_TAXA_MAX_PNCP=20
+    RADAR_HTTP_RETRIES_PNCP=3    (idem _SUPABASE, _TELEGRAM)
+- `timeout=` e `retries=` passados na chamada têm precedência sobre o padrão
+- `limite_do_host=False`: um 429 dessa chamada não reduz a taxa nem pausa o
+  host (o radar_telegram usa: o 429 do Telegram é por chat e ele mesmo
+  segura só aquele chat)
+"""
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("radar_http")
+
+
+def _config_grupo(grupo, pool, timeout, taxa, taxa_max, retries):
+    nome = grupo.upper()
+    return {
+        "pool": int(os.environ.get(f"RADAR_HTTP_POOL_{nome}", pool)),
+        "timeout": float(os.environ.get(f"RADAR_HTTP_TIMEOUT_{nome}", timeout)),
+        "taxa": float(os.environ.get(f"RADAR_HTTP_TAXA_{nome}", taxa)),
+        "taxa_max": float(os.environ.get(f"RADAR_HTTP_TAXA_MAX_{nome}", taxa_max)),
+        "retries": int(os.environ.get(f"RADAR_HTTP_RETRIES_{nome}", retries)),
+    }
+
+
+GRUPOS = {
+    "pncp": _config_grupo("pncp", 16, 30, taxa=5, taxa_max=20, retries=3),
+    "supabase": _config_grupo("supabase", 8, 15, taxa=10, taxa_max=50, retries=3),
+    # Telegram: limite global do bot (~30 msg/s); o de ~1 msg/s por chat é
+    # aplicado pelo radar_telegram, que faz os envios
+    "telegram": _config_grupo("telegram", 4, 10, taxa=20, taxa_max=25, retries=3),
+    "outros": _config_grupo("outros", 4, 30, taxa=5, taxa_max=20, retries=2),
+}
+
+TAXA_MIN = 0.2          # req/s — piso depois de vários 429/5xx seguidos
+AUMENTO_TAXA = 0.1      # req/s somados a cada resposta saudável
+BACKOFF_MAX = 60.0      # s — teto da espera entre repetições
+STATUS_REPETIR = {429, 500, 502, 503, 504}
+METODOS_IDEMPOTENTES = {"GET", "HEAD", "OPTIONS", "PUT", "PATCH", "DELETE"}
+
+_sessoes = {}  # host -> requests.Session
+_baldes = {}   # host -> BaldeTokens
+_lock = threading.Lock()
+
+
+def grupo_do_host(url):
+    """Classifica a URL em um dos grupos de GRUPOS pelo hostname."""
+    host = (urlsplit(url).hostname or "").lower()
+    if host == "pncp.gov.br" or host.endswith(".pncp.gov.br"):
+        return "pncp"
+    if host.endswith(".supabase.co"):
+        return "supabase"
+    if host == "api.telegram.org":
+        return "telegram"
+    return "outros"
+
+
+def obter_sessao(url):
+    """Retorna a Session do host da URL, criando o pool na primeira chamada."""
+    host = (urlsplit(url).hostname or "").lower()
+    with _lock:
+        sessao = _sessoes.get(host)
+        if sessao is None:
+            cfg = GRUPOS[grupo_do_host(url)]
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=cfg["pool"])
+            sessao = requests.Session()
+            sessao.mount("https://", adapter)
+            sessao.mount("http://", adapter)
+            _sessoes[host] = sessao
+    return sessao
+
+
+# ================= LIMITE DE TAXA =================
+
+class BaldeTokens:
+    """
+    Token bucket de um host com taxa adaptativa (aumento aditivo, redução
+    multiplicativa). `aguardar()` bloqueia a thread até haver um token livre.
+    """
+
+    def __init__(self, host, taxa, taxa_max, taxa_min=TAXA_MIN):
+        self.host = host
+        self.taxa_min = min(taxa_min, taxa)
+        self.taxa_max = max(taxa_max, taxa)
+        self.taxa = taxa
+        self.tokens = 1.0
+        self.pausado_ate = 0.0
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.requisicoes = 0
+        self.limitadas = 0  # respostas 429/5xx e erros de conexão
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                if agora < self.pausado_ate:
+                    espera = self.pausado_ate - agora
+                else:
+                    # Rajada máxima de ~1s de taxa (no mínimo 1 token)
+                    capacidade = max(1.0, self.taxa)
+                    self.tokens = min(capacidade, self.tokens + (agora - self._ultimo) * self.taxa)
+                    self._ultimo = agora
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        self.requisicoes += 1
+                        return
+                    espera = (1.0 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+    def registrar(self, status=None, retry_after=None, limite_do_host=True):
+        """
+        Ajusta a taxa pelo resultado: status None = erro de conexão/timeout.
+        Com `limite_do_host=False` um 429 só é contado: o limite é de outro
+        escopo (ex.: por chat no Telegram) e não deve frear nem pausar o host.
+        """
+        with self._lock:
+            if status == 429 and not limite_do_host:
+                self.limitadas += 1
+            elif status is None or status in STATUS_REPETIR:
+                self.limitadas += 1
+                self.taxa = max(self.taxa_min, self.taxa / 2)
+                self.tokens = min(self.tokens, 0.0)
+                if retry_after:
+                    self.pausado_ate = max(self.pausado_ate, time.monotonic() + retry_after)
+            elif status < 400:
+                self.taxa = min(self.taxa_max, self.taxa + AUMENTO_TAXA)
+
+
+def obter_balde(url):
+    host = (urlsplit(url).hostname or "").lower()
+    with _lock:
+        balde = _baldes.get(host)
+        if balde is None:
+            cfg = GRUPOS[grupo_do_host(url)]
+            balde = BaldeTokens(host, cfg["taxa"], cfg["taxa_max"])
+            _baldes[host] = balde
+    return balde
+
+
+def _retry_after(resp):
+    """Segundos pedidos pelo servidor: header Retry-After (segundos ou data HTTP)
+    ou `parameters.retry_after` no corpo (Telegram)."""
+    valor = resp.headers.get("Retry-After")
+    if valor:
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            try:
+                data = email.utils.parsedate_to_datetime(valor)
+                return max(0.0, data.timestamp() - time.time())
+            except Exception:
+                pass
+    if resp.status_code == 429:
+        try:
+            return float(resp.json().get("parameters", {}).get("retry_after"))
+        except Exception:
+            pass
+    return None
+
+
+def _backoff(tentativa):
+    return min(BACKOFF_MAX, 0.5 * 2 ** tentativa) * random.uniform(0.5, 1.0)
+
+
+# ================= REQUISIÇÕES =================
+
+def request(method, url, retries=None, limite_do_host=True, **kwargs):
+    cfg = GRUPOS[grupo_do_host(url)]
+    kwargs.setdefault("timeout", cfg["timeout"])
+    if retries is None:
+        retries = cfg["retries"]
+    method = method.upper()
+    idempotente = method in METODOS_IDEMPOTENTES
+    balde = obter_balde(url)
+    sessao = obter_sessao(url)
+
+    tentativa = 0
+    while True:
+        balde.aguardar()
+        try:
+            resp = sessao.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            balde.registrar(None)
+            if not idempotente or tentativa >= retries:
+                raise
+            tentativa += 1
+            espera = _backoff(tentativa)
+            log.warning(f"⏳ {balde.host}: {type(e).__name__} — tentativa {tentativa}/{retries} "
+                        f"em {espera:.1f}s")
+            time.sleep(espera)
+            continue
+
+        retry_after = _retry_after(resp) if resp.status_code in STATUS_REPETIR else None
+        balde.registrar(resp.status_code, retry_after, limite_do_host)
+
+        repetir = resp.status_code == 429 or (idempotente and resp.status_code in STATUS_REPETIR)
+        if not repetir or tentativa >= retries:
+            return resp
+
+        tentativa += 1
+        if retry_after:
+            # O balde já está pausado até lá; aguardar() segura esta e as demais threads
+            log.warning(f"⏳ {balde.host}: HTTP {resp.status_code}, Retry-After {retry_after:g}s — "
+                        f"tentativa {tentativa}/{retries}")
+        else:
+            espera = _backoff(tentativa)
+            log.warning(f"⏳ {balde.host}: HTTP {resp.status_code} — tentativa {tentativa}/{retries} "
+                        f"em {espera:.1f}s")
+            time.sleep(espera)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+
+def resumo():
+    """Uma linha por host: requisições, respostas limitadas e taxa final."""
+    with _lock:
+        baldes = list(_baldes.values())
+    return [
+        f"{b.host}: {b.requisicoes} req, {b.limitadas} 429/5xx/erro, taxa final {b.taxa:.1f} req/s"
+        for b in baldes
+    ]
+
+
+def fechar():
+    """Fecha todas as sessões abertas (útil em testes e ao fim de execuções longas)."""
+    with _lock:
+        for sessao in _sessoes.values():
+            sessao.close()
+        _sessoes.clear()
@@ -0,0 +1,166 @@
+"""
+RADAR LEDGER - Registro durável de unidades de trabalho do backfill
+===================================================================
+O backfill é dividido em unidades (período, keyword) gravadas num SQLite local.
+Workers em threads reservam uma unidade pendente, processam e marcam como
+concluída; uma execução interrompida retoma exatamente as que faltaram.
+
+- Estados: pendente → em_andamento → concluida (ou erro, depois de
+  MAX_TENTATIVAS falhas na mesma execução, ou de uma falha definitiva)
+- `pagina`: dica de retomada — a próxima página da busca a pedir para a
+  unidade, atualizada a cada página gravada (e adiantada por
+  `sugerir_pagina` quando outra unidade já sabe onde esta começa)
+- Unidades são reservadas do período mais recente para o mais antigo
+- `resetar_abandonadas()` devolve para pendente as unidades em_andamento e
+  erro deixadas por uma execução anterior (o workflow roda uma de cada vez)
+- Arquivo em BACKFILL_LEDGER (padrão .cache/backfill/ledger.sqlite3),
+  persistido entre execuções via actions/cache no workflow
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+log = logging.getLogger("radar_ledger")
+
+CAMINHO_PADRAO = os.environ.get("BACKFILL_LEDGER", ".cache/backfill/ledger.sqlite3")
+MAX_TENTATIVAS = 3
+
+ESTADOS = ("pendente", "em_andamento", "concluida", "erro")
+
+
+class Ledger:
+    """Unidades (periodo, keyword) num SQLite; seguro para várias threads do mesmo processo."""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, timeout=30)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS unidades (
+                periodo TEXT NOT NULL,
+                keyword TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendente',
+                pagina INTEGER NOT NULL DEFAULT 1,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                encontrados INTEGER NOT NULL DEFAULT 0,
+                erro TEXT,
+                atualizado_em REAL NOT NULL,
+                PRIMARY KEY (periodo, keyword)
+            )
+        """)
+        self._conexao.commit()
+
+    def _executar(self, sql, parametros=()):
+        with self._lock:
+            cursor = self._conexao.execute(sql, parametros)
+            self._conexao.commit()
+            return cursor
+
+    def registrar(self, unidades):
+        """Cria as unidades (periodo, keyword) que ainda não existem. Retorna quantas foram criadas."""
+        agora = time.time()
+        with self._lock:
+            antes = self._conexao.total_changes
+            self._conexao.executemany(
+                "INSERT OR IGNORE INTO unidades (periodo, keyword, atualizado_em) VALUES (?, ?, ?)",
+                [(periodo, keyword, agora) for periodo, keyword in unidades],
+            )
+            self._conexao.commit()
+            return self._conexao.total_changes - antes
+
+    def resetar_abandonadas(self):
+        """em_andamento/erro de execuções anteriores voltam a pendente (a dica de página é mantida)."""
+        cursor = self._executar(
+            "UPDATE unidades SET estado = 'pendente', tentativas = 0 "
+            "WHERE estado IN ('em_andamento', 'erro')"
+        )
+        return cursor.rowcount
+
+    def reservar(self):
+        """Reserva a próxima unidade pendente: (periodo, keyword, pagina), ou None se acabaram."""
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT periodo, keyword, pagina FROM unidades WHERE estado = 'pendente' "
+                "ORDER BY periodo DESC, keyword LIMIT 1"
+            ).fetchone()
+            if linha is None:
+                return None
+            self._conexao.execute(
+                "UPDATE unidades SET estado = 'em_andamento', tentativas = tentativas + 1, "
+                "atualizado_em = ? WHERE periodo = ? AND keyword = ?",
+                (time.time(), linha[0], linha[1]),
+            )
+            self._conexao.commit()
+            return linha
+
+    def avancar(self, periodo, keyword, pagina, encontrados=0):
+        """Registra que as páginas anteriores a `pagina` já foram gravadas."""
+        self._executar(
+            "UPDATE unidades SET pagina = ?, encontrados = encontrados + ?, atualizado_em = ? "
+            "WHERE periodo = ? AND keyword = ?",
+            (pagina, encontrados, time.time(), periodo, keyword),
+        )
+
+    def sugerir_pagina(self, periodo, keyword, pagina):
+        """Adianta a dica de página de uma unidade pendente (nunca volta)."""
+        self._executar(
+            "UPDATE unidades SET pagina = MAX(pagina, ?) "
+            "WHERE periodo = ? AND keyword = ? AND estado = 'pendente'",
+            (pagina, periodo, keyword),
+        )
+
+    def concluir(self, periodo, keyword, encontrados=0):
+        self._executar(
+            "UPDATE unidades SET estado = 'concluida', encontrados = encontrados + ?, erro = NULL, "
+            "atualizado_em = ? WHERE periodo = ? AND keyword = ?",
+            (encontrados, time.time(), periodo, keyword),
+        )
+
+    def falhar(self, periodo, keyword, motivo, definitivo=False):
+        """
+        Devolve a unidade para a fila, ou marca erro depois de MAX_TENTATIVAS.
+        `definitivo`: marca erro já (tentar de novo nesta execução não adianta).
+        """
+        self._executar(
+            "UPDATE unidades SET estado = CASE WHEN ? OR tentativas >= ? THEN 'erro' ELSE 'pendente' END, "
+            "erro = ?, atualizado_em = ? WHERE periodo = ? AND keyword = ?",
+            (definitivo, MAX_TENTATIVAS, str(motivo)[:500], time.time(), periodo, keyword),
+        )
+
+    def periodos(self):
+        """{periodo: (total de unidades, unidades concluídas)}."""
+        with self._lock:
+            linhas = self._conexao.execute(
+                "SELECT periodo, COUNT(*), SUM(estado = 'concluida') FROM unidades GROUP BY periodo"
+            ).fetchall()
+        return {periodo: (total, concluidas) for periodo, total, concluidas in linhas}
+
+    def contagem(self, periodos=None):
+        """{estado: n} (opcionalmente só dos `periodos` dados)."""
+        sql = "SELECT estado, COUNT(*) FROM unidades"
+        parametros = ()
+        if periodos is not None:
+            periodos = list(periodos)
+            sql += f" WHERE periodo IN ({','.join('?' * len(periodos))})"
+            parametros = tuple(periodos)
+        with self._lock:
+            linhas = self._conexao.execute(sql + " GROUP BY estado", parametros).fetchall()
+        contagem = dict.fromkeys(ESTADOS, 0)
+        contagem.update(dict(linhas))
+        return contagem
+
+    def resumo(self, periodos=None):
+        c = self.contagem(periodos)
+        return (f"{c['concluida']} concluída(s), {c['pendente']} pendente(s), "
+                f"{c['em_andamento']} em andamento, {c['erro']} com erro")
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
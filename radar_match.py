@@ -0,0 +1,230 @@
+"""
+RADAR MATCH - Casamento de keywords em uma única passada (Aho–Corasick)
+=======================================================================
+Os robôs checam objeto e descrição de cada item contra listas de até ~230
+keywords. Em vez de um `kw.lower() in texto` por keyword, o Matcher compila
+a lista uma vez (no import do script) num autômato Aho–Corasick e encontra
+todas as ocorrências percorrendo o texto uma única vez.
+
+- Texto e keywords passam pela mesma normalização (`normalizar`): sem
+  acentos, casefold e espaços colapsados — "CÂNHAMO", "canhamo" e
+  "Cânhamo" são a mesma coisa; keywords repetidas após normalizar viram uma
+- Keywords em `palavra_inteira` (ex.: "cbd", "thc") só contam se não
+  estiverem coladas a caracteres proibidos antes/depois — mesma regra das
+  regex usadas antes nos scripts
+- `tem(texto)`: True/False, para na primeira ocorrência válida. Usa um
+  autômato podado: keyword que contém outra keyword (ex.: "acido
+  quenodesoxicolico" ⊃ "quenodesoxicolico") é redundante para o booleano
+- `identificar(texto)`: keyword de maior prioridade (ordem da lista) presente
+
+Comparar recall com o casamento antigo (.lower() + substring) num corpus de
+descrições gravadas, uma por linha:
+    python radar_match.py corpus.txt LICITACAO_ALTOCUSTO.py
+"""
+
+import re
+import string
+import sys
+import time
+import unicodedata
+from collections import deque
+from functools import lru_cache
+
+# Regra do LICITACAO.PY para palavra inteira: (?<![a-zA-Z0-9])kw(?![a-zA-Z])
+PROIBIDO_ANTES = string.ascii_letters + string.digits
+PROIBIDO_DEPOIS = string.ascii_letters
+
+
+# Marcas combinantes (acentos, til, cedilha) que o NFKD separa da letra base
+_DIACRITICOS = re.compile("[\u0300-\u036f]")
+
+
+@lru_cache(maxsize=4096)
+def _normalizar(texto):
+    if not texto.isascii():
+        texto = _DIACRITICOS.sub("", unicodedata.normalize("NFKD", texto))
+    return " ".join(texto.casefold().split())
+
+
+def normalizar(texto):
+    """Forma canônica para casamento: sem acentos, casefold, espaços colapsados.
+    Com cache — objeto e itens costumam ser checados por mais de uma função."""
+    if not texto:
+        return ""
+    return _normalizar(str(texto))
+
+
+class _Automato:
+    """Trie + links de falha sobre [(padrao, indice, palavra_inteira)]."""
+
+    def __init__(self, padroes):
+        self.goto = [{}]
+        self.falha = [0]
+        self.saida = [[]]  # estado -> [(indice do termo, tamanho, palavra_inteira)]
+
+        for padrao, indice, inteira in padroes:
+            estado = 0
+            for c in padrao:
+                proximo = self.goto[estado].get(c)
+                if proximo is None:
+                    proximo = len(self.goto)
+                    self.goto[estado][c] = proximo
+                    self.goto.append({})
+                    self.falha.append(0)
+                    self.saida.append([])
+                estado = proximo
+            self.saida[estado].append((indice, len(padrao), inteira))
+
+        # Links de falha em largura; a saída de cada estado herda a do seu sufixo.
+        # Filhos da raiz falham para a raiz (valor inicial 0).
+        fila = deque(self.goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            for c, filho in self.goto[estado].items():
+                fila.append(filho)
+                f = self.falha[estado]
+                while f and c not in self.goto[f]:
+                    f = self.falha[f]
+                if estado:
+                    self.falha[filho] = self.goto[f].get(c, 0)
+                self.saida[filho] = self.saida[filho] + self.saida[self.falha[filho]]
+
+        # Transições completas (DFA) sobre o alfabeto das keywords: a busca faz uma
+        # consulta por caractere; caractere fora do alfabeto volta para a raiz.
+        alfabeto = {c for padrao, _, _ in padroes for c in padrao}
+        self.delta = [None] * len(self.goto)
+        self.delta[0] = {c: self.goto[0].get(c, 0) for c in alfabeto}
+        fila = deque(self.goto[0].values())
+        while fila:
+            estado = fila.popleft()
+            fila.extend(self.goto[estado].values())
+            self.delta[estado] = {**self.delta[self.falha[estado]], **self.goto[estado]}
+
+
+class Matcher:
+    """Autômato Aho–Corasick sobre `termos` (comparação no texto normalizado)."""
+
+    def __init__(self, termos, palavra_inteira=(), proibido_antes=PROIBIDO_ANTES,
+                 proibido_depois=PROIBIDO_DEPOIS):
+        self.termos = list(termos)
+        self.proibido_antes = frozenset(proibido_antes)
+        self.proibido_depois = frozenset(proibido_depois)
+        inteiras = {normalizar(p) for p in palavra_inteira}
+
+        # Uma entrada por forma normalizada; vale o índice da primeira ocorrência
+        unicos = {}
+        for indice, termo in enumerate(self.termos):
+            padrao = normalizar(termo)
+            if padrao and padrao not in unicos:
+                unicos[padrao] = (padrao, indice, padrao in inteiras)
+        self.padroes = list(unicos.values())
+
+        substrings = [p for p, _, inteira in self.padroes if not inteira]
+        podados = [
+            (p, i, inteira) for p, i, inteira in self.padroes
+            if not any(s != p and s in p for s in substrings)
+        ]
+        self.padroes_podados = podados
+
+        self._completo = _Automato(self.padroes)
+        self._podado = _Automato(podados)
+
+    def _ocorrencias(self, texto, automato):
+        """Gera (indice do termo, início) de cada ocorrência válida em `texto`."""
+        texto = normalizar(texto)
+        delta, saida = automato.delta, automato.saida
+        estado = 0
+        for fim, c in enumerate(texto):
+            estado = delta[estado].get(c, 0)
+            if not saida[estado]:
+                continue
+            for indice, tamanho, inteira in saida[estado]:
+                inicio = fim - tamanho + 1
+                if inteira:
+                    if inicio > 0 and texto[inicio - 1] in self.proibido_antes:
+                        continue
+                    if fim + 1 < len(texto) and texto[fim + 1] in self.proibido_depois:
+                        continue
+                yield indice, inicio
+
+    def tem(self, texto):
+        if not texto:
+            return False
+        for _ in self._ocorrencias(texto, self._podado):
+            return True
+        return False
+
+    def encontrar(self, texto):
+        """Keywords presentes em `texto`, na ordem da lista original
+        (de keywords equivalentes após normalizar, só a primeira)."""
+        if not texto:
+            return []
+        indices = {indice for indice, _ in self._ocorrencias(texto, self._completo)}
+        return [self.termos[i] for i in sorted(indices)]
+
+    def identificar(self, texto):
+        """Primeira keyword da lista (maior prioridade) presente em `texto`, ou None."""
+        if not texto:
+            return None
+        indices = [indice for indice, _ in self._ocorrencias(texto, self._completo)]
+        return self.termos[min(indices)] if indices else None
+
+
+# ================= COMPARAÇÃO DE RECALL =================
+
+def _carregar_script(caminho):
+    import importlib.machinery
+    import importlib.util
+    loader = importlib.machinery.SourceFileLoader("_radar_script", caminho)
+    spec = importlib.util.spec_from_loader("_radar_script", loader)
+    modulo = importlib.util.module_from_spec(spec)
+    loader.exec_module(modulo)
+    return modulo
+
+
+def comparar_recall(linhas, termos):
+    """Casamento antigo (.lower() + substring) x Matcher normalizado nas mesmas linhas."""
+    termos_lower = [t.lower() for t in termos]
+    matcher = Matcher(termos)
+
+    t0 = time.perf_counter()
+    antigo = []
+    for linha in linhas:
+        linha_lower = linha.lower()
+        antigo.append(any(t in linha_lower for t in termos_lower))
+    t1 = time.perf_counter()
+    _normalizar.cache_clear()
+    novo = [matcher.tem(linha) for linha in linhas]
+    t2 = time.perf_counter()
+
+    return {
+        "linhas": len(linhas),
+        "termos": len(termos),
+        "padroes": len(matcher.padroes),
+        "padroes_podados": len(matcher.padroes_podados),
+        "match_antigo": sum(antigo),
+        "match_novo": sum(novo),
+        "so_antigo": [l for l, a, n in zip(linhas, antigo, novo) if a and not n],
+        "so_novo": [l for l, a, n in zip(linhas, antigo, novo) if n and not a],
+        "tempo_antigo": t1 - t0,
+        "tempo_novo": t2 - t1,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("uso: python radar_match.py CORPUS.txt SCRIPT.py")
+        sys.exit(2)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        corpus = [l.rstrip("\n") for l in f if l.strip()]
+    r = comparar_recall(corpus, _carregar_script(sys.argv[2]).KEYWORDS)
+    print(f"Linhas: {r['linhas']} | termos: {r['termos']} → {r['padroes']} padrões normalizados "
+          f"({r['padroes_podados']} no autômato booleano)")
+    print(f"Match antigo: {r['match_antigo']} ({r['tempo_antigo']:.3f}s)")
+    print(f"Match novo:   {r['match_novo']} ({r['tempo_novo']:.3f}s)")
+    print(f"Só no antigo (perda de recall): {len(r['so_antigo'])}")
+    for linha in r["so_antigo"][:20]:
+        print(f"  - {linha[:120]}")
+    print(f"Só no novo (ganho de recall):   {len(r['so_novo'])}")
+    for linha in r["so_novo"][:20]:
+        print(f"  + {linha[:120]}")
@@ -0,0 +1,420 @@
+"""
+RADAR SUPABASE - Operações em lote no PostgREST do Supabase
+===========================================================
+Funções compartilhadas pelos robôs para falar com as tabelas editais_* / itens_*
+em poucas requisições, em vez de uma por edital.
+
+- buscar_existentes: resolve centenas de url_id em alguns GET ?url_id=in.(...),
+  fatiados para respeitar o limite de tamanho de URL (buscar_existentes_contratacoes:
+  o mesmo a partir das contratações do dia, com CAMPOS_EXISTENTES)
+- buscar_itens_por_edital: itens de vários editais num GET
+  ?edital_url_id=in.(...) (mesmo fatiamento), agrupados em memória
+- carregar_paginado: tabela inteira (ou um filtro dela) em faixas Range
+  buscadas em paralelo, com o total do Content-Range (usado pelo dashboard)
+- chamar_rpc: funções do banco via /rest/v1/rpc/ (ex.: refresh da view
+  editais_resumo_pncp, SUPABASE_RESUMO_EDITAIS.sql)
+- BufferGravacao: junta editais novos + itens e grava em upserts multi-linha
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus
+
+import radar_http
+
+log = logging.getLogger("radar_supabase")
+
+# Tamanho máximo (já codificado) do filtro in.(...) em uma única URL.
+# PostgREST/Kong aceitam URLs bem maiores, mas 6 KB fica longe de qualquer proxy.
+LIMITE_FILTRO_URL = 6000
+
+# Colunas trazidas pela pré-verificação em lote dos radares (usadas por ATUALIZAR_DATAS)
+CAMPOS_EXISTENTES = ["url_id", "data_inicio", "data_fim", "data_publicacao"]
+
+
+def url_id_da_contratacao(item):
+    """Monta o url_id (/compras/{cnpj}/{ano}/{seq}) de uma contratação normalizada."""
+    cnpj = item.get("orgaoEntidade", {}).get("cnpj", "")
+    ano = item.get("anoCompra")
+    seq = item.get("sequencialCompra")
+    if not cnpj or not ano or not seq:
+        return None
+    return f"/compras/{cnpj}/{ano}/{seq}"
+
+
+def _valor_in(valor):
+    # Aspas duplas protegem "/", "," e "." dentro do in.(...)
+    return '"' + str(valor).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def fatiar_filtro_in(valores, limite=LIMITE_FILTRO_URL):
+    """Divide `valores` em lotes cujo filtro in.(...) codificado cabe em `limite` caracteres."""
+    lote, tamanho = [], len(quote_plus("in.()"))
+    for valor in valores:
+        custo = len(quote_plus(_valor_in(valor) + ","))
+        if lote and tamanho + custo > limite:
+            yield lote
+            lote, tamanho = [], len(quote_plus("in.()"))
+        lote.append(valor)
+        tamanho += custo
+    if lote:
+        yield lote
+
+
+def filtro_in(valores):
+    return "in.(" + ",".join(_valor_in(v) for v in valores) + ")"
+
+
+def filtro_contem_algum(coluna, termos):
+    """Lista para o parâmetro `or` do PostgREST: `coluna` contém algum dos `termos` (ilike)."""
+    return "(" + ",".join(f"{coluna}.ilike.{_valor_in(f'*{t}*')}" for t in termos) + ")"
+
+
+def buscar_existentes(endpoint, headers, url_ids, colunas="url_id", coluna_chave="url_id"):
+    """
+    Consulta em lote quais `url_ids` já existem na tabela `endpoint`.
+    Retorna {url_id: registro com `colunas`}, ou None se alguma consulta falhar
+    (o chamador deve então cair na verificação individual).
+    """
+    unicos = list(dict.fromkeys(u for u in url_ids if u))
+    existentes = {}
+    if not unicos:
+        return existentes
+
+    n_consultas = 0
+    for lote in fatiar_filtro_in(unicos):
+        try:
+            r = radar_http.get(
+                endpoint,
+                headers=headers,
+                params={coluna_chave: filtro_in(lote), "select": colunas},
+                timeout=15,
+            )
+            n_consultas += 1
+            if r.status_code != 200:
+                log.warning(f"Pré-verificação Supabase retornou {r.status_code}: {r.text[:200]}")
+                return None
+            for registro in r.json():
+                existentes[registro.get(coluna_chave)] = registro
+        except Exception as e:
+            log.warning(f"Erro na pré-verificação Supabase: {e}")
+            return None
+
+    log.info(f"   🗂️  Pré-verificação: {len(existentes)}/{len(unicos)} já no banco "
+             f"({n_consultas} consulta(s))")
+    return existentes
+
+
+def buscar_existentes_contratacoes(endpoint, headers, contratacoes, colunas=CAMPOS_EXISTENTES):
+    """Pré-verificação do dia: {url_id: registro} de todas as `contratacoes` em poucas consultas."""
+    url_ids = [url_id_da_contratacao(c) for c in contratacoes]
+    return buscar_existentes(endpoint, headers, url_ids, colunas=",".join(colunas))
+
+
+def _ordem_numero_item(item):
+    """Chave numérica de numero_item; sem número vai para o fim (sort estável mantém a ordem de id)."""
+    numero = str(item.get("numero_item") or "").strip()
+    return (0, int(numero)) if numero.isdigit() else (1, 0)
+
+
+def buscar_itens_por_edital(endpoint, headers, url_ids, colunas="*", pagina=1000):
+    """
+    Itens de todos os `url_ids` em uma consulta por lote do filtro in.(...)
+    (paginada de `pagina` em `pagina` linhas, o max-rows padrão do Supabase,
+    ordenada pela chave única `id` para limit/offset não repetir nem pular linhas).
+    Retorna {url_id: [itens]} com os itens de cada edital pela ordem numérica
+    de numero_item (texto na tabela: "10" viria antes de "2"); {} se alguma
+    consulta falhar.
+    """
+    unicos = list(dict.fromkeys(u for u in url_ids if u))
+    if colunas != "*":
+        for coluna in ("numero_item", "edital_url_id"):
+            if coluna not in colunas.split(","):
+                colunas = f"{coluna},{colunas}"
+    por_edital = {}
+    n_consultas = 0
+    for lote in fatiar_filtro_in(unicos):
+        offset = 0
+        while True:
+            try:
+                r = radar_http.get(
+                    endpoint,
+                    headers=headers,
+                    params={"edital_url_id": filtro_in(lote), "select": colunas,
+                            "order": "id",
+                            "limit": pagina, "offset": offset},
+                    timeout=15,
+                )
+                n_consultas += 1
+                if r.status_code != 200:
+                    log.warning(f"Consulta de itens em lote retornou {r.status_code}: {r.text[:200]}")
+                    return {}
+                linhas = r.json()
+            except Exception as e:
+                log.warning(f"Erro na consulta de itens em lote: {e}")
+                return {}
+            for item in linhas:
+                por_edital.setdefault(item.get("edital_url_id"), []).append(item)
+            if len(linhas) < pagina:
+                break
+            offset += pagina
+
+    for itens in por_edital.values():
+        itens.sort(key=_ordem_numero_item)
+    log.info(f"   🗂️  Itens: {sum(map(len, por_edital.values()))} de {len(por_edital)}/{len(unicos)} "
+             f"edital(is) ({n_consultas} consulta(s))")
+    return por_edital
+
+
+# ================= LEITURA PAGINADA =================
+
+def _total_content_range(resp):
+    """Total de linhas do cabeçalho Content-Range ("0-999/12345", "*/0"); None se desconhecido."""
+    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def carregar_paginado(endpoint, headers, params, pagina=1000, paralelas=4, timeout=30):
+    """
+    Todas as linhas de um GET do PostgREST, em faixas `Range: início-fim` de
+    `pagina` linhas. A primeira faixa pede `Prefer: count=exact` e o total que
+    volta no Content-Range define as demais, buscadas em `paralelas` threads.
+
+    - `params` precisa de um `order` com chave única: faixas só são
+      consistentes se a ordem das linhas for estável
+    - Se o servidor devolver menos que `pagina` linhas na primeira faixa
+      (max-rows do projeto menor), as faixas seguintes usam esse tamanho
+    - Sem total no Content-Range, segue faixa a faixa (do tamanho que a
+      primeira trouxe) até uma vir vazia — uma faixa curta pode ser só o
+      max-rows do servidor, não o fim da tabela
+
+    Retorna a lista de linhas na ordem de `order`, ou None se alguma faixa falhar.
+    """
+    def faixa(inicio, tamanho, contar=False):
+        cabecalhos = {**headers, "Range-Unit": "items", "Range": f"{inicio}-{inicio + tamanho - 1}"}
+        if contar:
+            cabecalhos["Prefer"] = "count=exact"
+        r = radar_http.get(endpoint, headers=cabecalhos, params=params, timeout=timeout)
+        if r.status_code == 416:  # faixa além do fim (linhas apagadas no meio da leitura)
+            return [], None
+        if r.status_code not in (200, 206):
+            raise RuntimeError(f"HTTP {r.status_code}: {r.text[:200]}")
+        return r.json(), _total_content_range(r) if contar else None
+
+    try:
+        linhas, total = faixa(0, pagina, contar=True)
+        if total is None:
+            tamanho = len(linhas)
+            while tamanho:
+                proximas, _ = faixa(len(linhas), tamanho)
+                if not proximas:
+                    break
+                linhas += proximas
+            return linhas
+        if total <= len(linhas):
+            return linhas
+
+        tamanho = len(linhas) or pagina
+        inicios = range(len(linhas), total, tamanho)
+        with ThreadPoolExecutor(max_workers=max(1, paralelas)) as pool:
+            for proximas, _ in pool.map(lambda inicio: faixa(inicio, tamanho), inicios):
+                linhas += proximas
+    except Exception as e:
+        log.warning(f"Leitura paginada de {endpoint} falhou: {e}")
+        return None
+
+    if len(linhas) != total:
+        log.warning(f"Leitura paginada de {endpoint}: {len(linhas)} linha(s), Content-Range dizia {total}")
+    return linhas
+
+
+# ================= RPC =================
+
+def chamar_rpc(supabase_url, headers, funcao, argumentos=None, timeout=60):
+    """
+    POST /rest/v1/rpc/{funcao}. Retorna True se o banco aceitou; falha (função
+    não instalada, sem permissão, timeout) só gera aviso — nada nos robôs depende disso.
+    """
+    try:
+        r = radar_http.post(f"{supabase_url}/rest/v1/rpc/{funcao}", headers=headers,
+                            json=argumentos or {}, timeout=timeout)
+        if r.status_code in (200, 204):
+            log.info(f"🔄 RPC {funcao}: ok")
+            return True
+        log.warning(f"RPC {funcao} retornou {r.status_code}: {r.text[:200]}")
+    except Exception as e:
+        log.warning(f"Erro na RPC {funcao}: {e}")
+    return False
+
+
+# ================= GRAVAÇÃO EM LOTE =================
+
+class BufferGravacao:
+    """
+    Acumula editais novos e seus itens e grava tudo em upserts multi-linha
+    (POST ?on_conflict=url_id com uma lista no corpo).
+
+    - Descarrega quando atinge `max_linhas` editais ou `max_bytes` de payload
+    - Itens só são gravados para editais cuja inserção foi confirmada
+    - Se um lote falha, é dividido ao meio até isolar as linhas ruins; cada
+      falha fica em `falhas` como (tabela, url_id, motivo) e não derruba o resto
+    - Um edital só conta como gravado com ele e os itens confirmados; se os
+      itens falham, o edital é apagado de novo para uma nova tentativa não o
+      achar "já no banco" sem itens. flush() retorna os url_ids que não foram
+      gravados; eles ficam em `nao_gravados` (o flush pode ser de outra thread —
+      veja nao_gravados_entre) e podem ser enfileirados de novo
+    - `ao_salvar` (opcional, por edital) roda depois que o edital e os itens
+      foram gravados — é onde os robôs disparam o alerta do Telegram
+    """
+
+    def __init__(self, endpoint_editais, endpoint_itens, headers,
+                 max_linhas=50, max_bytes=256_000, timeout=30):
+        self.endpoint_editais = endpoint_editais
+        self.endpoint_itens = endpoint_itens
+        self.headers_editais = {**headers, "Prefer": "resolution=merge-duplicates,return=minimal"}
+        self.headers_itens = {**headers, "Prefer": "return=minimal"}
+        self.max_linhas = max_linhas
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+
+        self.inseridos = 0
+        self.itens_inseridos = 0
+        self.falhas = []
+        self.nao_gravados = set()
+        self.requisicoes = 0
+
+        self._pendentes = []  # (edital, itens, ao_salvar)
+        self._url_ids = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._lock_flush = threading.Lock()
+
+    def adicionar(self, edital, itens=None, ao_salvar=None):
+        """Enfileira um edital novo. Retorna False se o url_id já estava no buffer."""
+        url_id = edital["url_id"]
+        itens = [{**item, "edital_url_id": url_id} for item in (itens or [])]
+        tamanho = len(json.dumps([edital, itens], default=str).encode())
+        with self._lock:
+            if url_id in self._url_ids:
+                return False
+            self._url_ids.add(url_id)
+            self._pendentes.append((edital, itens, ao_salvar))
+            self._bytes += tamanho
+            cheio = len(self._pendentes) >= self.max_linhas or self._bytes >= self.max_bytes
+        if cheio:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Grava tudo o que estiver pendente. Seguro para chamar de várias threads.
+        Retorna o set de url_ids do lote que não foram gravados (edital ou itens).
+        """
+        with self._lock_flush:
+            with self._lock:
+                lote, self._pendentes, self._bytes = self._pendentes, [], 0
+            if not lote:
+                return set()
+
+            grupos_editais = [(e["url_id"], [e]) for e, _, _ in _uniformizar_editais(lote)]
+            ok_editais = self._gravar(self.endpoint_editais, self.headers_editais,
+                                      grupos_editais, "editais", on_conflict="url_id")
+
+            gravados = [(e, itens, cb) for e, itens, cb in lote if e["url_id"] in ok_editais]
+            grupos_itens = [(e["url_id"], itens) for e, itens, _ in gravados if itens]
+            ok_itens = self._gravar(self.endpoint_itens, self.headers_itens, grupos_itens, "itens")
+
+            completos = [(e, itens, cb) for e, itens, cb in gravados
+                         if not itens or e["url_id"] in ok_itens]
+            sem_itens = [e["url_id"] for e, itens, _ in gravados if itens and e["url_id"] not in ok_itens]
+            if sem_itens:
+                self._desfazer(sem_itens)
+            falharam = {e["url_id"] for e, _, _ in lote} - {e["url_id"] for e, _, _ in completos}
+            with self._lock:
+                self.inseridos += len(completos)
+                self.itens_inseridos += sum(len(i) for u, i in grupos_itens if u in ok_itens)
+                # Quem falhou pode voltar ao buffer numa nova tentativa
+                self._url_ids -= falharam
+                self.nao_gravados -= {e["url_id"] for e, _, _ in completos}
+                self.nao_gravados |= falharam
+
+            log.info(f"💾 Lote gravado: {len(gravados)}/{len(lote)} edital(is), "
+                     f"{len(ok_itens)}/{len(grupos_itens)} grupo(s) de itens")
+            if falharam:
+                log.warning(f"⚠️  {len(falharam)} edital(is) do lote não gravado(s) por completo")
+
+            for edital, _, ao_salvar in completos:
+                if ao_salvar:
+                    try:
+                        ao_salvar()
+                    except Exception as e:
+                        log.error(f"Erro no pós-gravação de {edital['url_id']}: {e}")
+            return falharam
+
+    def _desfazer(self, url_ids):
+        """Apaga editais gravados cujos itens falharam (os itens não entraram)."""
+        for lote in fatiar_filtro_in(url_ids):
+            try:
+                res = radar_http.delete(self.endpoint_editais, headers=self.headers_itens,
+                                        params={"url_id": filtro_in(lote)}, timeout=self.timeout)
+                self.requisicoes += 1
+                if res.status_code in [200, 204]:
+                    continue
+                motivo = f"{res.status_code} - {res.text[:200]}"
+            except Exception as e:
+                motivo = str(e)
+            log.error(f"ERRO ao desfazer {len(lote)} edital(is) sem itens: {motivo}")
+
+    def nao_gravados_entre(self, url_ids):
+        """
+        Quais de `url_ids` ficaram sem gravar. Chamar depois do próprio flush():
+        ele espera um flush em andamento de outra thread, que pode ter levado
+        editais deste chamador.
+        """
+        with self._lock:
+            return set(url_ids) & self.nao_gravados
+
+    def _gravar(self, endpoint, headers, grupos, tabela, on_conflict=None):
+        """
+        POST de todos os grupos (chave, linhas) numa requisição. Se falhar, divide
+        a lista de grupos ao meio e tenta cada metade. Retorna as chaves gravadas.
+        """
+        if not grupos:
+            return set()
+        linhas = [linha for _, grupo in grupos for linha in grupo]
+        url = f"{endpoint}?on_conflict={on_conflict}" if on_conflict else endpoint
+        try:
+            res = radar_http.post(url, headers=headers, json=linhas, timeout=self.timeout)
+            self.requisicoes += 1
+            if res.status_code in [200, 201, 204]:
+                return {chave for chave, _ in grupos}
+            motivo = f"{res.status_code} - {res.text[:200]}"
+        except Exception as e:
+            motivo = str(e)
+
+        if len(grupos) == 1:
+            chave = grupos[0][0]
+            log.error(f"ERRO gravação {tabela} ({chave}): {motivo}")
+            with self._lock:
+                self.falhas.append((tabela, chave, motivo))
+            return set()
+
+        meio = len(grupos) // 2
+        return (self._gravar(endpoint, headers, grupos[:meio], tabela, on_conflict) |
+                self._gravar(endpoint, headers, grupos[meio:], tabela, on_conflict))
+
+    def resumo(self):
+        return (f"{self.inseridos} edital(is) e {self.itens_inseridos} item(ns) gravados "
+                f"em {self.requisicoes} requisição(ões), {len(self.falhas)} falha(s)")
+
+
+def _uniformizar_editais(lote):
+    """PostgREST exige as mesmas chaves em todas as linhas de um insert em lote."""
+    chaves = []
+    for edital, _, _ in lote:
+        for k in edital:
+            if k not in chaves:
+                chaves.append(k)
+    return [({k: edital.get(k) for k in chaves}, itens, cb) for edital, itens, cb in lote]
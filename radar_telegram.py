@@ -0,0 +1,347 @@
+"""
+RADAR TELEGRAM - Envio de mensagens em segundo plano
+====================================================
+Os radares montavam a mensagem e faziam o POST no sendMessage ali mesmo, no
+meio do processamento: cada alerta (e cada 429 com retry_after) segurava a
+varredura do PNCP. Aqui as mensagens entram numa fila e threads próprias
+fazem o envio.
+
+- enviar(): enfileira e retorna na hora; o envio acontece em
+  TELEGRAM_WORKERS=4 threads
+- Limite por chat (TELEGRAM_TAXA_POR_CHAT=1 msg/s, o documentado pelo
+  Telegram); o limite global por host fica com o token bucket do radar_http
+  (grupo telegram)
+- 429: a mensagem volta para a fila com horário = agora + retry_after e o
+  chat fica parado até lá; outras mensagens e quem enfileira seguem livres.
+  5xx/erro de rede: nova tentativa com espera crescente, até MAX_TENTATIVAS
+- Mensagens de um mesmo chat saem na ordem em que foram enfileiradas
+  (salvo as que voltaram por erro)
+- flush(prazo): chamado ao fim do main; espera a fila esvaziar por até
+  TELEGRAM_PRAZO_FLUSH=120s e registra o que ficou sem enviar
+- Alertas: alertas de editais novos de uma execução. Os primeiros
+  TELEGRAM_DIGEST_MINIMO=8 saem na hora, um por edital, como sempre; a partir
+  daí viram um resumo (digest): uma linha por edital com link para o PNCP,
+  agrupada por UF ou categoria, no menor número de mensagens que o limite de
+  4096 caracteres do Telegram permite. O digest pendente sai quando enche uma
+  mensagem, a cada TELEGRAM_DIGEST_LOTE=200 editais, ao fim de cada unidade do
+  backfill (descarregar) e no fim da execução
+"""
+
+import html
+import logging
+import os
+import threading
+import time
+
+import radar_http
+
+log = logging.getLogger("radar_telegram")
+
+URL_API = "https://api.telegram.org/bot{token}/sendMessage"
+
+WORKERS = int(os.environ.get("TELEGRAM_WORKERS", "4"))
+TAXA_POR_CHAT = float(os.environ.get("TELEGRAM_TAXA_POR_CHAT", "1"))
+PRAZO_FLUSH = float(os.environ.get("TELEGRAM_PRAZO_FLUSH", "120"))
+MAX_TENTATIVAS = 5
+DIGEST_MINIMO = int(os.environ.get("TELEGRAM_DIGEST_MINIMO", "8"))
+DIGEST_LOTE = int(os.environ.get("TELEGRAM_DIGEST_LOTE", "200"))
+LIMITE_TEXTO = 4096
+ESPERA_MAX = 30.0  # s — teto da espera entre tentativas sem retry_after
+
+_fila = []             # mensagens pendentes (dicts), na ordem de chegada
+_proximo_envio = {}    # (token, chat_id) -> monotonic a partir do qual o chat pode receber
+_em_voo = 0
+_threads = []
+_cond = threading.Condition()
+_sequencia = 0
+
+estatisticas = {"enfileiradas": 0, "enviadas": 0, "repetidas": 0, "falhas": 0, "descartadas": 0}
+
+
+def enviar(token, chat_id, texto, descricao="", **opcoes):
+    """
+    Enfileira um sendMessage (parse_mode HTML) e retorna sem esperar.
+    `opcoes` vão no corpo (ex.: disable_web_page_preview=True); `descricao`
+    aparece no log quando a mensagem sai.
+    """
+    global _sequencia
+    if not token or not chat_id:
+        return
+    with _cond:
+        _sequencia += 1
+        _fila.append({
+            "seq": _sequencia,
+            "chat": (token, str(chat_id)),
+            "corpo": {"chat_id": chat_id, "text": texto, "parse_mode": "HTML", **opcoes},
+            "descricao": descricao,
+            "pronta_em": 0.0,
+            "tentativas": 0,
+        })
+        estatisticas["enfileiradas"] += 1
+        _iniciar_workers()
+        _cond.notify()
+
+
+def _iniciar_workers():
+    """Sobe as threads de envio que faltam (chamar com _cond)."""
+    _threads[:] = [t for t in _threads if t.is_alive()]
+    while len(_threads) < WORKERS:
+        t = threading.Thread(target=_worker, name=f"telegram-{len(_threads) + 1}", daemon=True)
+        _threads.append(t)
+        t.start()
+
+
+def _proxima():
+    """
+    Retira da fila a primeira mensagem que já pode sair (horário próprio e do
+    chat vencidos, e chat sem outra mensagem anterior pendente). Retorna
+    (mensagem, None) ou (None, segundos até a próxima ficar pronta). Chamar com _cond.
+    """
+    agora = time.monotonic()
+    espera = None
+    vistos = set()
+    for i, msg in enumerate(_fila):
+        chat = msg["chat"]
+        if chat in vistos:
+            continue  # mantém a ordem dentro do chat
+        vistos.add(chat)
+        pronta = max(msg["pronta_em"], _proximo_envio.get(chat, 0.0))
+        if pronta <= agora:
+            del _fila[i]
+            _proximo_envio[chat] = agora + 1.0 / TAXA_POR_CHAT
+            return msg, None
+        espera = pronta - agora if espera is None else min(espera, pronta - agora)
+    return None, espera
+
+
+def _worker():
+    global _em_voo
+    while True:
+        with _cond:
+            while True:
+                msg, espera = _proxima()
+                if msg:
+                    _em_voo += 1
+                    break
+                if not _fila and espera is None:
+                    # Fila vazia: encerra depois de um tempo ocioso (enviar() sobe outra)
+                    if not _cond.wait(timeout=30) and not _fila:
+                        return
+                else:
+                    _cond.wait(timeout=espera)
+        try:
+            _enviar_agora(msg)
+        finally:
+            with _cond:
+                _em_voo -= 1
+                _cond.notify_all()
+
+
+def _enviar_agora(msg):
+    token, _ = msg["chat"]
+    msg["tentativas"] += 1
+    retry_after = None
+    try:
+        # 429 aqui é do chat: o próprio dispatcher segura só esse chat, sem pausar o host todo
+        resp = radar_http.post(URL_API.format(token=token), json=msg["corpo"], retries=0, timeout=10,
+                               limite_do_host=False)
+        if resp.status_code == 200:
+            with _cond:
+                estatisticas["enviadas"] += 1
+            if msg["descricao"]:
+                log.info(f"🚀 Telegram enviado: {msg['descricao'][:60]}")
+            return
+        motivo = f"HTTP {resp.status_code}: {resp.text[:200]}"
+        if resp.status_code == 429:
+            try:
+                retry_after = float(resp.json().get("parameters", {}).get("retry_after"))
+            except Exception:
+                retry_after = 5.0
+        elif resp.status_code < 500:
+            _falhar(msg, motivo)  # 400/403: mensagem inválida ou bot sem acesso — não adianta repetir
+            return
+    except Exception as e:
+        motivo = str(e)
+
+    if msg["tentativas"] >= MAX_TENTATIVAS:
+        _falhar(msg, motivo)
+        return
+    espera = retry_after if retry_after is not None else min(ESPERA_MAX, 2.0 ** msg["tentativas"])
+    with _cond:
+        msg["pronta_em"] = time.monotonic() + espera
+        if retry_after is not None:
+            # O chat inteiro aguarda o retry_after; a mensagem mantém o lugar na fila
+            _proximo_envio[msg["chat"]] = max(_proximo_envio.get(msg["chat"], 0.0), msg["pronta_em"])
+        _fila.insert(_posicao_no_chat(msg), msg)
+        estatisticas["repetidas"] += 1
+        _cond.notify_all()
+    log.warning(f"⏳ Telegram {motivo[:80]} — nova tentativa em {espera:g}s "
+                f"({msg['tentativas']}/{MAX_TENTATIVAS})")
+
+
+def _posicao_no_chat(msg):
+    """Índice que devolve `msg` à frente das mensagens mais novas do mesmo chat (chamar com _cond)."""
+    for i, outra in enumerate(_fila):
+        if outra["seq"] > msg["seq"]:
+            return i
+    return len(_fila)
+
+
+def _falhar(msg, motivo):
+    with _cond:
+        estatisticas["falhas"] += 1
+    log.error(f"Telegram erro ({msg['descricao'][:60] or 'mensagem'}): {motivo}")
+
+
+def flush(prazo=None):
+    """
+    Espera a fila esvaziar (e os envios em andamento terminarem) por até
+    `prazo` segundos. O que sobrar é descartado e registrado. Retorna True se
+    tudo foi entregue (ou falhou definitivamente) a tempo.
+    """
+    prazo = PRAZO_FLUSH if prazo is None else prazo
+    limite = time.monotonic() + prazo
+    with _cond:
+        if not _fila and not _em_voo and not estatisticas["enfileiradas"]:
+            return True
+        while _fila or _em_voo:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            _cond.wait(timeout=restante)
+        sobras = len(_fila)
+        if sobras:
+            estatisticas["descartadas"] += sobras
+            _fila.clear()
+    if sobras:
+        log.warning(f"⚠️ Telegram: prazo de {prazo:g}s esgotado — {sobras} mensagem(ns) não enviada(s)")
+    log.info(f"📨 Telegram: {resumo()}")
+    return not sobras
+
+
+def resumo():
+    return (f"{estatisticas['enviadas']}/{estatisticas['enfileiradas']} enviada(s), "
+            f"{estatisticas['repetidas']} nova(s) tentativa(s), {estatisticas['falhas']} falha(s), "
+            f"{estatisticas['descartadas']} descartada(s) no prazo")
+
+
+# ================= DIGEST =================
+
+def linha_digest(link, orgao, titulo, *detalhes):
+    """
+    Uma linha do digest: órgão com link para o edital, título e detalhes opcionais.
+    Os campos de texto são cortados antes do escape — a linha pronta nunca é
+    cortada, para não partir uma tag ou entidade HTML.
+    """
+    partes = [f'• <a href="{html.escape(link)}">{html.escape(orgao[:70])}</a> — {html.escape(titulo[:80])}']
+    partes += [html.escape(str(d)[:60]) for d in detalhes if d]
+    return " | ".join(partes)
+
+
+def montar_digest(cabecalho, grupos, rodape="", limite=LIMITE_TEXTO):
+    """
+    Empacota {grupo: [linhas]} em mensagens de até `limite` caracteres.
+    Grupos em ordem alfabética; um grupo que não cabe continua na mensagem
+    seguinte com o título repetido. Cabeçalho ganha "(parte i/n)" se preciso.
+    As linhas (de linha_digest) entram inteiras.
+    """
+    folga = len(cabecalho) + len(rodape) + 40  # "(parte i/n)" e quebras de linha
+    partes, atual = [], ""
+    for grupo in sorted(grupos):
+        titulo_grupo = f"\n\n<b>{html.escape(grupo)}</b> ({len(grupos[grupo])})"
+        bloco = titulo_grupo
+        for linha in grupos[grupo]:
+            if len(atual) + len(bloco) + len(linha) + 1 + folga > limite:
+                if bloco != titulo_grupo:
+                    atual += bloco
+                if atual:
+                    partes.append(atual)
+                atual, bloco = "", titulo_grupo + " (cont.)"
+            bloco += "\n" + linha
+        atual += bloco
+    if atual:
+        partes.append(atual)
+
+    total = len(partes)
+    mensagens = []
+    for i, corpo in enumerate(partes, 1):
+        sufixo = f" (parte {i}/{total})" if total > 1 else ""
+        mensagens.append(f"{cabecalho}{sufixo}{corpo}" + (f"\n\n{rodape}" if rodape else ""))
+    return mensagens
+
+
+class Alertas:
+    """
+    Alertas de editais novos de uma execução. adicionar() manda na hora a
+    mensagem individual dos `minimo` primeiros editais; depois disso entra em
+    modo digest e guarda só a linha do digest. O digest sai quando a próxima
+    linha não cabe mais numa mensagem de LIMITE_TEXTO, a cada DIGEST_LOTE
+    linhas, em descarregar() (fim de uma unidade do backfill) e no enviar() do fim.
+    """
+
+    def __init__(self, token, chat_id, cabecalho, rodape="", minimo=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.cabecalho = cabecalho
+        self.rodape = rodape
+        self.minimo = DIGEST_MINIMO if minimo is None else minimo
+        self.total = 0
+        self.digests = 0
+        self._pendentes = []  # (grupo, linha) do próximo digest
+        self._lock = threading.Lock()
+
+    @property
+    def modo_digest(self):
+        return self.total > self.minimo
+
+    def adicionar(self, grupo, linha, mensagem, descricao="", **opcoes):
+        with self._lock:
+            self.total += 1
+            if not self.modo_digest:
+                enviar(self.token, self.chat_id, mensagem, descricao=descricao, **opcoes)
+                return
+            pendente = (grupo or "Sem UF", linha)
+            if self._pendentes and len(self._montar(self._pendentes + [pendente])) > 1:
+                # Os pendentes já enchem uma mensagem: saem antes desta linha
+                self._enviar_digest()
+            self._pendentes.append(pendente)
+            if len(self._pendentes) >= DIGEST_LOTE:
+                self._enviar_digest()
+
+    def _montar(self, pendentes):
+        grupos = {}
+        for grupo, linha in pendentes:
+            grupos.setdefault(grupo, []).append(linha)
+        return montar_digest(f"{self.cabecalho}\n🆕 {len(pendentes)} edital(is) novo(s)", grupos, self.rodape)
+
+    def _enviar_digest(self, anexo=""):
+        """Manda os pendentes como digest (chamar com _lock). `anexo` vai no fim da última mensagem."""
+        n = len(self._pendentes)
+        mensagens = self._montar(self._pendentes)
+        self._pendentes = []
+        if anexo and len(mensagens[-1]) + len(anexo) + 2 <= LIMITE_TEXTO:
+            mensagens[-1] += f"\n\n{anexo}"
+            anexo = ""
+        for mensagem in mensagens:
+            enviar(self.token, self.chat_id, mensagem, descricao=f"digest de {n} edital(is)",
+                   disable_web_page_preview=True)
+        self.digests += len(mensagens)
+        log.info(f"📦 Digest: {n} edital(is) em {len(mensagens)} mensagem(ns)")
+        return anexo
+
+    def descarregar(self):
+        """Manda o digest pendente, se houver (o backfill chama ao fim de cada unidade)."""
+        with self._lock:
+            if self._pendentes:
+                self._enviar_digest()
+
+    def enviar(self, anexo=""):
+        """
+        Fim da execução: manda o digest pendente e o `anexo` (ex.: mensagem de
+        fechamento) — dentro do último digest se couber.
+        """
+        with self._lock:
+            if self._pendentes:
+                anexo = self._enviar_digest(anexo)
+        if anexo:
+            enviar(self.token, self.chat_id, anexo, descricao="fechamento")